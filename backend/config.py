@@ -13,8 +13,125 @@ COHERE_API_KEY = os.getenv("COHERE_API_KEY", "")
 # Neon Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# LISTEN and the schema lock need a session-level connection, so bypass
+# Neon's pgbouncer pooler
+DATABASE_LISTEN_URL = os.getenv("DATABASE_LISTEN_URL", DATABASE_URL.replace("-pooler", ""))
+
+# Optional read replica for read-only booking and knowledge queries
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+
+# Seconds after a write during which reads stay on the primary
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+
 # CORS Configuration
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
+# Server
+# Worker processes started by serve.py (uvicorn reads the same variable)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+PORT = int(os.getenv("PORT", "7860"))
+# Seconds in-flight requests get to finish on shutdown before being cancelled
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "25"))
+# Proxy addresses or networks trusted to set X-Forwarded-For (comma
+# separated), so clients are rate limited by their real address. The client
+# is the rightmost untrusted entry; * would trust the leftmost one, which
+# the client writes itself.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Readiness Checks
+# Seconds a /health/ready result is reused, and the timeout of each probe
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+
 # Chat Configuration
 MAX_CONVERSATION_HISTORY = 20
+
+# Chat Admission Control
+# Messages per second (sustained) and burst allowed per client IP, and
+# across all clients together (0 disables a limit)
+CHAT_RATE_PER_CLIENT = float(os.getenv("CHAT_RATE_PER_CLIENT", "0.2"))
+CHAT_BURST_PER_CLIENT = float(os.getenv("CHAT_BURST_PER_CLIENT", "5"))
+CHAT_RATE_GLOBAL = float(os.getenv("CHAT_RATE_GLOBAL", "5"))
+CHAT_BURST_GLOBAL = float(os.getenv("CHAT_BURST_GLOBAL", "20"))
+# Chats answered at once (0 for no limit), chats allowed to wait for a
+# place, and how long they wait before a 503
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "16"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "5"))
+
+# Booking Configuration
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "60"))
+AVAILABILITY_MAX_RANGE_DAYS = 366
+AVAILABILITY_CALENDAR_MONTHS = int(os.getenv("AVAILABILITY_CALENDAR_MONTHS", "24"))
+# Largest CSV body POST /api/bookings/import accepts
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Booking Partitions
+# bookings is partitioned by event_date year; partitions are created this
+# many years ahead of the current one
+BOOKING_PARTITION_YEARS_AHEAD = int(os.getenv("BOOKING_PARTITION_YEARS_AHEAD", "2"))
+# scripts/archive_bookings.py keeps this many past years in bookings
+BOOKING_ARCHIVE_AFTER_YEARS = int(os.getenv("BOOKING_ARCHIVE_AFTER_YEARS", "2"))
+
+# Live Change Feed
+# How long booking changes are kept for clients resuming the feed
+CHANGE_FEED_RETENTION_HOURS = float(os.getenv("CHANGE_FEED_RETENTION_HOURS", "24"))
+# Changes buffered per subscriber before it falls back to reading the log
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+
+# Idempotency Keys
+# How long the response to a request with an Idempotency-Key is kept
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# How long a retry waits for the original request to finish before a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+# A request still running after this long is assumed lost and may be retried
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+
+# Tracing
+# "none" (default), "file" (JSON spans appended to TRACING_FILE),
+# "console", or "otlp" (OTLP over HTTP to TRACING_OTLP_ENDPOINT)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Share of new traces kept; a request continuing a sampled trace is always kept
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "starcrescent-api")
+
+# Phone Numbers
+# Numbers without an international prefix are assumed to be in this country
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "92")
+# Phone lookups also match numbers ending in the same digits (0, the
+# default, to disable). Off by default: the chatbot's booking lookup is
+# unauthenticated, and a suffix match would show one customer's bookings to
+# someone with the same number under another country code.
+PHONE_SUFFIX_DIGITS = int(os.getenv("PHONE_SUFFIX_DIGITS", "0"))
+
+# Statement Mode
+# "prepared" prepares the statement registry on every new connection.
+# "pooler" disables server-side statement caching so queries work behind a
+# transaction-pooling proxy such as Neon's pgbouncer endpoint.
+# "auto" picks "pooler" when DATABASE_URL points at a "-pooler" host.
+DB_STATEMENT_MODE = os.getenv("DB_STATEMENT_MODE", "auto").lower()
+
+# Connection Pool Configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Connections the Neon compute accepts (max_connections less its reserved
+# superuser slots, e.g. 97 at 0.25 CU). When set, each worker's pool is
+# capped at its share, after DB_CONNECTION_RESERVE for scripts and the
+# console and one LISTEN connection per worker. 0 to size by
+# DB_POOL_MAX_SIZE alone.
+DB_CONNECTION_LIMIT = int(os.getenv("DB_CONNECTION_LIMIT", "0"))
+DB_CONNECTION_RESERVE = int(os.getenv("DB_CONNECTION_RESERVE", "5"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+# Seconds a starting worker waits for another to finish creating the schema
+DB_SCHEMA_LOCK_TIMEOUT = float(os.getenv("DB_SCHEMA_LOCK_TIMEOUT", "120"))
+
+# Keepalive pings stop Neon from suspending compute during business hours
+# (Neon suspends after 5 minutes idle). Set the interval to 0 to disable.
+DB_KEEPALIVE_INTERVAL = float(os.getenv("DB_KEEPALIVE_INTERVAL", "240"))
+BUSINESS_HOURS_START = int(os.getenv("BUSINESS_HOURS_START", "16"))
+BUSINESS_HOURS_END = int(os.getenv("BUSINESS_HOURS_END", "24"))
+BUSINESS_UTC_OFFSET = float(os.getenv("BUSINESS_UTC_OFFSET", "5"))  # Pakistan Standard Time
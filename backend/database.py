@@ -2,95 +2,1061 @@
 Neon Database Connection Module
 PostgreSQL with pgvector for embeddings storage
 """
+import asyncio
+import time
 import asyncpg
 from contextlib import asynccontextmanager
-from config import DATABASE_URL
+from datetime import date, datetime, timedelta, timezone
+from contextvars import ContextVar
+from config import (
+    DATABASE_URL, DATABASE_READ_URL, DATABASE_LISTEN_URL,
+    DB_READ_YOUR_WRITES_WINDOW, DB_STATEMENT_MODE,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_CONNECTION_LIMIT, DB_CONNECTION_RESERVE,
+    WEB_CONCURRENCY, DB_ACQUIRE_TIMEOUT,
+    DB_MAX_INACTIVE_LIFETIME, DB_COMMAND_TIMEOUT, DB_SCHEMA_LOCK_TIMEOUT,
+    DB_KEEPALIVE_INTERVAL, BUSINESS_HOURS_START, BUSINESS_HOURS_END,
+    BUSINESS_UTC_OFFSET, PHONE_SUFFIX_DIGITS, BOOKING_PARTITION_YEARS_AHEAD
+)
+from statements import STATEMENTS, STATEMENT_EXTENSIONS, SEARCH_DOCUMENT_SQL
+import metrics
+import tracing
 
-# Connection pool
+# Connection pools (the read pool is optional and points at a replica)
 _pool = None
+_read_pool = None
+
+# Optional extensions that are installed, found while creating the schema
+_extensions = set()
+
+# Ad-hoc queries each connection caches besides the registered statements
+STATEMENT_CACHE_ADHOC = 100
+
+# First key of the advisory lock held while creating booking partitions
+PARTITION_LOCK_NAMESPACE = 7302
+# First key of the advisory lock serializing schema creation across workers
+SCHEMA_LOCK_NAMESPACE = 7303
+
+# Background keepalive and partition maintenance tasks
+_keepalive_task = None
+_partition_task = None
+
+# Dedicated LISTEN connection shared by every channel, with its subscribers
+_listen_conn = None
+_channels = {}
+_reconnect_callbacks = []
+
+# Acquire wait statistics per pool (seconds)
+_acquire_stats = {
+    name: {"acquires": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0}
+    for name in ("primary", "replica")
+}
+
+# Header carrying the time of a client's last booking change, so its reads
+# stay on the primary whichever worker serves them
+LAST_WRITE_HEADER = "Last-Write-At"
+
+# Read-your-writes state of the current request: the last write time the
+# client sent back and the time this request wrote (wall clock, shared by
+# every worker). Set by ReadYourWritesMiddleware.
+_write_state = ContextVar("write_state", default=None)
+
+
+def statement_mode(dsn: str = DATABASE_URL) -> str:
+    """Resolve the configured statement mode to "prepared" or "pooler"."""
+    if DB_STATEMENT_MODE in ("prepared", "pooler"):
+        return DB_STATEMENT_MODE
+    return "pooler" if "-pooler" in dsn else "prepared"
+
+
+async def _create_schema(conn):
+    """Create extensions, tables and indexes."""
+    # Enable pgvector extension
+    await conn.execute('CREATE EXTENSION IF NOT EXISTS vector')
+
+    # Create bookings table
+    await create_bookings_table(conn)
+
+    # Exact and suffix phone lookups on the normalized number
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS bookings_phone_e164_idx
+        ON bookings (customer_phone_e164)
+    ''')
+    if PHONE_SUFFIX_DIGITS > 0:
+        await conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS bookings_phone_suffix{PHONE_SUFFIX_DIGITS}_idx
+            ON bookings (right(customer_phone_e164, {PHONE_SUFFIX_DIGITS}))
+        ''')
+
+    # Keyset pagination indexes, scanned backwards for newest-first pages
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS bookings_event_date_id_idx
+        ON bookings (event_date, id)
+    ''')
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS bookings_status_event_date_id_idx
+        ON bookings (status, event_date, id)
+    ''')
+
+    # Active bookings per date, for availability counts and range calendars
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS bookings_active_event_date_idx
+        ON bookings (event_date)
+        WHERE status NOT IN ('cancelled', 'rejected')
+    ''')
+
+    # Tell every worker which dates changed so in-memory calendars stay in sync
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION notify_booking_calendar() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('booking_calendar', NEW.event_date::text);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('booking_calendar', OLD.event_date::text);
+            ELSIF NEW.event_date IS DISTINCT FROM OLD.event_date
+                  OR NEW.status IS DISTINCT FROM OLD.status
+                  OR NEW.slot_id IS DISTINCT FROM OLD.slot_id THEN
+                PERFORM pg_notify('booking_calendar',
+                                  OLD.event_date::text || ',' || NEW.event_date::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    await conn.execute('''
+        CREATE OR REPLACE TRIGGER bookings_calendar_notify
+        AFTER INSERT OR UPDATE OR DELETE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION notify_booking_calendar()
+    ''')
+
+    await _create_booking_versions(conn)
+    await _create_booking_changes(conn)
+    await _create_booking_stats(conn)
+    await _create_slot_bookings(conn)
+
+    # Stored responses of requests sent with an Idempotency-Key. A row with
+    # no status_code yet is a request still running.
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            scope VARCHAR(20) NOT NULL,
+            key VARCHAR(255) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            status_code INTEGER,
+            response JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (scope, key)
+        )
+    ''')
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS idempotency_keys_created_at_idx
+        ON idempotency_keys (created_at)
+    ''')
+
+    # Trigram index for the dashboard's fuzzy booking search. pg_trgm is
+    # optional: without it the rest of the app works and search is disabled.
+    try:
+        await conn.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        await conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS bookings_search_trgm_idx
+            ON bookings USING gin ({SEARCH_DOCUMENT_SQL} gin_trgm_ops)
+        ''')
+    except asyncpg.PostgresError as e:
+        print(f"[WARNING] pg_trgm not available (booking search disabled): {str(e).splitlines()[0]}")
+
+    installed = await conn.fetch('SELECT extname FROM pg_extension')
+    _extensions.clear()
+    _extensions.update(row["extname"] for row in installed)
+
+    # Create knowledge embeddings table
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_embeddings (
+            id SERIAL PRIMARY KEY,
+            content TEXT NOT NULL,
+            category VARCHAR(100),
+            embedding vector(1024),
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    # Create index for vector similarity search
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS knowledge_embedding_idx
+        ON knowledge_embeddings
+        USING ivfflat (embedding vector_cosine_ops)
+        WITH (lists = 100)
+    ''')
+
+
+async def create_bookings_table(conn):
+    """
+    Create the bookings table, partitioned by event_date year. Databases
+    created before partitioning keep a plain table until
+    scripts/partition_bookings.py migrates them.
+    """
+    # Bookings reference the slot they occupy
+    await _create_slots(conn)
+
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id SERIAL,
+            customer_name VARCHAR(255) NOT NULL,
+            customer_phone VARCHAR(20) NOT NULL,
+            customer_email VARCHAR(255),
+            event_type VARCHAR(100) NOT NULL,
+            event_date DATE NOT NULL,
+            guest_count INTEGER,
+            package_type VARCHAR(100),
+            special_requests TEXT,
+            status VARCHAR(50) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (id, event_date)
+        ) PARTITION BY RANGE (event_date)
+    ''')
+
+    # Phone numbers normalized to E.164 on write; older rows are filled in
+    # by services.booking.backfill_phone_numbers at startup
+    await conn.execute('''
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS customer_phone_e164 VARCHAR(16)
+    ''')
+    # Incremented on every update (see _create_booking_versions)
+    await conn.execute('''
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1
+    ''')
+    # Older rows are given a slot by _create_slot_bookings
+    await conn.execute('''
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS slot_id INTEGER REFERENCES slots (id)
+    ''')
+
+    if await bookings_partitioned(conn):
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS bookings_default PARTITION OF bookings DEFAULT
+        ''')
+        await ensure_booking_partitions(conn)
+    else:
+        print("[WARNING] bookings is not partitioned; run scripts/partition_bookings.py")
+
+
+async def bookings_partitioned(conn) -> bool:
+    """Check whether bookings is a partitioned table."""
+    return await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = 'bookings'::regclass"
+    )
+
+
+async def booking_partitions(conn) -> dict:
+    """Year partitions of bookings: {year: partition name}."""
+    rows = await conn.fetch('''
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'bookings'::regclass
+    ''')
+    partitions = {}
+    for row in rows:
+        name = row["relname"]
+        if name.startswith("bookings_y") and name[10:].isdigit():
+            partitions[int(name[10:])] = name
+    return partitions
+
+
+async def ensure_booking_partitions(conn, first_year: int = None):
+    """
+    Create year partitions from first_year (default: this year) through
+    BOOKING_PARTITION_YEARS_AHEAD years ahead. Bookings that landed in the
+    default partition for one of those years are moved into it.
+    """
+    this_year = date.today().year
+    years = range(min(first_year or this_year, this_year), this_year + BOOKING_PARTITION_YEARS_AHEAD + 1)
+    async with conn.transaction():
+        # One process at a time, so concurrent workers never race on DDL
+        await conn.execute('SELECT pg_advisory_xact_lock($1, 0)', PARTITION_LOCK_NAMESPACE)
+        existing = await booking_partitions(conn)
+        for year in years:
+            if year in existing:
+                continue
+            name = f"bookings_y{year}"
+            bounds = f"FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            strays = await conn.fetchval(
+                "SELECT COUNT(*) FROM bookings_default WHERE event_date >= $1 AND event_date < $2",
+                date(year, 1, 1), date(year + 1, 1, 1)
+            )
+            if not strays:
+                await conn.execute(f'CREATE TABLE {name} PARTITION OF bookings FOR VALUES {bounds}')
+                continue
+            # The new partition's range may not overlap rows in the default
+            # partition, so move them across while it is detached. Writing
+            # to partitions directly skips the stats and change log triggers
+            # on bookings, which is right: no booking changed.
+            await conn.execute('ALTER TABLE bookings DETACH PARTITION bookings_default')
+            await conn.execute(f'CREATE TABLE {name} PARTITION OF bookings FOR VALUES {bounds}')
+            await conn.execute(f'''
+                WITH moved AS (
+                    DELETE FROM bookings_default
+                    WHERE event_date >= '{year}-01-01' AND event_date < '{year + 1}-01-01'
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            ''')
+            await conn.execute('ALTER TABLE bookings ATTACH PARTITION bookings_default DEFAULT')
+            print(f"Moved {strays} bookings into new partition {name}")
+
+
+async def _create_slots(conn):
+    """
+    Bookable slots: a time slot of a resource (the lawn, a hall) that takes
+    up to `capacity` bookings per date. Seeded with the lawn's morning and
+    evening slots, which replace the old fixed two bookings per date.
+    """
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS slots (
+            id SERIAL PRIMARY KEY,
+            resource VARCHAR(50) NOT NULL,
+            name VARCHAR(50) NOT NULL,
+            starts_at TIME NOT NULL,
+            ends_at TIME NOT NULL,
+            capacity INTEGER NOT NULL DEFAULT 1 CHECK (capacity >= 0),
+            active BOOLEAN NOT NULL DEFAULT TRUE,
+            UNIQUE (resource, name)
+        )
+    ''')
+    await conn.execute('''
+        INSERT INTO slots (resource, name, starts_at, ends_at, capacity)
+        SELECT * FROM (VALUES
+            ('lawn', 'morning', TIME '10:00', TIME '15:00', 1),
+            ('lawn', 'evening', TIME '18:00', TIME '23:59', 1)
+        ) AS seed
+        WHERE NOT EXISTS (SELECT 1 FROM slots)
+    ''')
+
+    # Workers cache the slots (services/slots.py) and reload them on change
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION notify_booking_slots() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('booking_slots', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    await conn.execute('''
+        CREATE OR REPLACE TRIGGER slots_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON slots
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_booking_slots()
+    ''')
+
+
+async def _create_booking_versions(conn):
+    """Per-booking versions and a table-wide revision, used as ETags."""
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION bump_booking_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    await conn.execute('''
+        CREATE OR REPLACE TRIGGER bookings_version_bump
+        BEFORE UPDATE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION bump_booking_version()
+    ''')
+
+    # One row, bumped in the writing transaction (see _create_booking_changes)
+    # so a reader never sees a new revision before the change it stands for
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS booking_revision (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            revision BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    await conn.execute('''
+        INSERT INTO booking_revision (id) VALUES (TRUE) ON CONFLICT DO NOTHING
+    ''')
+
+
+async def _create_booking_changes(conn):
+    """
+    Change log behind the live change feed. Every statement that changes
+    bookings bumps the revision and logs one row per booking under it.
+    """
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS booking_changes (
+            id BIGSERIAL PRIMARY KEY,
+            revision BIGINT NOT NULL,
+            booking_id INTEGER,
+            operation VARCHAR(8) NOT NULL,
+            booking JSONB,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    ''')
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS booking_changes_revision_idx
+        ON booking_changes (revision)
+    ''')
+
+    # The revision row stays locked until the writer commits, so revisions
+    # become visible strictly in order and readers can use them as a cursor
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION log_booking_changes() RETURNS trigger AS $$
+        DECLARE
+            current_revision BIGINT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM 1 FROM old_rows LIMIT 1;
+                IF NOT FOUND THEN RETURN NULL; END IF;
+            ELSIF TG_OP <> 'TRUNCATE' THEN
+                PERFORM 1 FROM new_rows LIMIT 1;
+                IF NOT FOUND THEN RETURN NULL; END IF;
+            END IF;
+
+            UPDATE booking_revision SET revision = revision + 1
+            RETURNING revision INTO current_revision;
+
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO booking_changes (revision, booking_id, operation)
+                SELECT current_revision, o.id, 'delete' FROM old_rows o ORDER BY o.id;
+            ELSIF TG_OP = 'TRUNCATE' THEN
+                INSERT INTO booking_changes (revision, operation)
+                VALUES (current_revision, 'truncate');
+            ELSE
+                INSERT INTO booking_changes (revision, booking_id, operation, booking)
+                SELECT current_revision, n.id, lower(TG_OP),
+                       to_jsonb(n) - 'customer_phone_e164'
+                       || jsonb_build_object('slot', s.resource || '-' || s.name)
+                FROM new_rows n
+                LEFT JOIN slots s ON s.id = n.slot_id
+                ORDER BY n.id;
+            END IF;
+
+            PERFORM pg_notify('booking_changes', current_revision::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    # Replaced by the bookings_changes_* triggers
+    await conn.execute('DROP TRIGGER IF EXISTS bookings_revision_bump ON bookings')
+    await conn.execute('DROP FUNCTION IF EXISTS bump_booking_revision()')
+    for event, tables in (
+        ("INSERT", "REFERENCING NEW TABLE AS new_rows"),
+        ("UPDATE", "REFERENCING NEW TABLE AS new_rows"),
+        ("DELETE", "REFERENCING OLD TABLE AS old_rows"),
+        ("TRUNCATE", ""),
+    ):
+        await conn.execute(f'''
+            CREATE OR REPLACE TRIGGER bookings_changes_{event.lower()}
+            AFTER {event} ON bookings
+            {tables}
+            FOR EACH STATEMENT EXECUTE FUNCTION log_booking_changes()
+        ''')
+
+
+async def _create_booking_stats(conn):
+    """
+    Create the booking_stats summary table and the statement-level triggers
+    that keep it current, so dashboard stats never scan bookings.
+    """
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS booking_stats (
+            dimension VARCHAR(20) NOT NULL,
+            key VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        )
+    ''')
+
+    # The stats keys of one booking: status, event type, month and guest bucket
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION booking_stat_keys(
+            status VARCHAR, event_type VARCHAR, event_date DATE, guest_count INTEGER
+        ) RETURNS TABLE (dimension VARCHAR, key VARCHAR) AS $$
+            VALUES
+                ('status'::varchar, COALESCE(status, 'unknown')::varchar),
+                ('event_type', event_type),
+                ('month', to_char(event_date, 'YYYY-MM')::varchar),
+                ('guest_count', CASE
+                    WHEN guest_count IS NULL THEN 'unknown'
+                    WHEN guest_count < 100 THEN '0-99'
+                    WHEN guest_count < 300 THEN '100-299'
+                    WHEN guest_count < 500 THEN '300-499'
+                    WHEN guest_count < 800 THEN '500-799'
+                    ELSE '800+'
+                END::varchar)
+        $$ LANGUAGE sql STABLE
+    ''')
+
+    # One upsert per statement from the transition tables, so bulk writes
+    # (imports, batch updates) cost one aggregate rather than one per row.
+    # Keys are upserted in a fixed order so concurrent writers cannot deadlock.
+    # The rows are picked with EXECUTE because each trigger event only has
+    # the transition tables it declares.
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION update_booking_stats() RETURNS trigger AS $$
+        DECLARE
+            changes TEXT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM booking_stats;
+                RETURN NULL;
+            END IF;
+
+            changes := CASE TG_OP
+                WHEN 'INSERT' THEN
+                    'SELECT 1 AS delta, status, event_type, event_date, guest_count FROM new_rows'
+                WHEN 'DELETE' THEN
+                    'SELECT -1 AS delta, status, event_type, event_date, guest_count FROM old_rows'
+                ELSE
+                    'SELECT 1 AS delta, status, event_type, event_date, guest_count FROM new_rows
+                     UNION ALL
+                     SELECT -1, status, event_type, event_date, guest_count FROM old_rows'
+            END;
+
+            EXECUTE format('
+                INSERT INTO booking_stats (dimension, key, count)
+                SELECT k.dimension, k.key, SUM(c.delta)
+                FROM (%s) c
+                CROSS JOIN LATERAL booking_stat_keys(c.status, c.event_type, c.event_date, c.guest_count) k
+                GROUP BY k.dimension, k.key
+                HAVING SUM(c.delta) <> 0
+                ORDER BY k.dimension, k.key
+                ON CONFLICT (dimension, key)
+                DO UPDATE SET count = booking_stats.count + EXCLUDED.count
+            ', changes);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    # Transition tables need one trigger per event
+    for event, tables in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        await conn.execute(f'''
+            CREATE OR REPLACE TRIGGER bookings_stats_{event.lower()}
+            AFTER {event} ON bookings
+            REFERENCING {tables}
+            FOR EACH STATEMENT EXECUTE FUNCTION update_booking_stats()
+        ''')
+    await conn.execute('''
+        CREATE OR REPLACE TRIGGER bookings_stats_truncate
+        AFTER TRUNCATE ON bookings
+        FOR EACH STATEMENT EXECUTE FUNCTION update_booking_stats()
+    ''')
+
+    # Backfill once, for bookings made before the triggers existed. SHARE
+    # mode blocks writers so no change is counted twice or missed.
+    async with conn.transaction():
+        await conn.execute('LOCK TABLE bookings IN SHARE MODE')
+        await conn.execute('''
+            INSERT INTO booking_stats (dimension, key, count)
+            SELECT k.dimension, k.key, COUNT(*)
+            FROM bookings b
+            CROSS JOIN LATERAL booking_stat_keys(b.status, b.event_type, b.event_date, b.guest_count) k
+            WHERE NOT EXISTS (SELECT 1 FROM booking_stats)
+            GROUP BY k.dimension, k.key
+        ''')
+
+
+async def _create_slot_bookings(conn):
+    """
+    Create the slot_bookings occupancy table: active bookings per slot and
+    date, kept current by statement-level triggers like booking_stats, so
+    capacity checks and availability are primary key lookups.
+    """
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS slot_bookings (
+            event_date DATE NOT NULL,
+            slot_id INTEGER NOT NULL REFERENCES slots (id),
+            booked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_date, slot_id)
+        )
+    ''')
+
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION update_slot_bookings() RETURNS trigger AS $$
+        DECLARE
+            changes TEXT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM slot_bookings;
+                RETURN NULL;
+            END IF;
+
+            changes := CASE TG_OP
+                WHEN 'INSERT' THEN
+                    'SELECT 1 AS delta, event_date, slot_id, status FROM new_rows'
+                WHEN 'DELETE' THEN
+                    'SELECT -1 AS delta, event_date, slot_id, status FROM old_rows'
+                ELSE
+                    'SELECT 1 AS delta, event_date, slot_id, status FROM new_rows
+                     UNION ALL
+                     SELECT -1, event_date, slot_id, status FROM old_rows'
+            END;
+
+            EXECUTE format('
+                INSERT INTO slot_bookings (event_date, slot_id, booked)
+                SELECT c.event_date, c.slot_id, SUM(c.delta)
+                FROM (%s) c
+                WHERE c.slot_id IS NOT NULL
+                AND c.status NOT IN (''cancelled'', ''rejected'')
+                GROUP BY c.event_date, c.slot_id
+                HAVING SUM(c.delta) <> 0
+                ORDER BY c.event_date, c.slot_id
+                ON CONFLICT (event_date, slot_id)
+                DO UPDATE SET booked = slot_bookings.booked + EXCLUDED.booked
+            ', changes);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    for event, tables in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        await conn.execute(f'''
+            CREATE OR REPLACE TRIGGER bookings_slots_{event.lower()}
+            AFTER {event} ON bookings
+            REFERENCING {tables}
+            FOR EACH STATEMENT EXECUTE FUNCTION update_slot_bookings()
+        ''')
+    await conn.execute('''
+        CREATE OR REPLACE TRIGGER bookings_slots_truncate
+        AFTER TRUNCATE ON bookings
+        FOR EACH STATEMENT EXECUTE FUNCTION update_slot_bookings()
+    ''')
+
+    # Count existing bookings once, then give active bookings from before
+    # slots a slot each: the nth booking of a date takes the nth place in
+    # slot order. Dates that were overbooked wrap around and stay overbooked.
+    # The lock keeps writers (and other workers' startup) out meanwhile.
+    async with conn.transaction():
+        await conn.execute('LOCK TABLE bookings IN SHARE ROW EXCLUSIVE MODE')
+        await conn.execute('''
+            INSERT INTO slot_bookings (event_date, slot_id, booked)
+            SELECT event_date, slot_id, COUNT(*)
+            FROM bookings
+            WHERE slot_id IS NOT NULL
+            AND status NOT IN ('cancelled', 'rejected')
+            AND NOT EXISTS (SELECT 1 FROM slot_bookings)
+            GROUP BY event_date, slot_id
+        ''')
+        assigned = await conn.execute('''
+            WITH places AS (
+                SELECT s.id AS slot_id,
+                       row_number() OVER (ORDER BY s.starts_at, s.id, n) AS place,
+                       COUNT(*) OVER () AS places
+                FROM slots s
+                CROSS JOIN generate_series(1, s.capacity) AS n
+                WHERE s.active
+            ),
+            legacy AS (
+                SELECT id, event_date,
+                       row_number() OVER (PARTITION BY event_date ORDER BY id) AS number
+                FROM bookings
+                WHERE slot_id IS NULL
+                AND status NOT IN ('cancelled', 'rejected')
+            )
+            UPDATE bookings b
+            SET slot_id = p.slot_id
+            FROM legacy l
+            JOIN places p ON p.place = (l.number - 1) % p.places + 1
+            WHERE b.id = l.id AND b.event_date = l.event_date
+        ''')
+        if assigned != "UPDATE 0":
+            print(f"Assigned slots to {assigned.split()[-1]} existing bookings")
+
+
+async def _prepare_statements(conn):
+    """Prepare every registered statement on a new connection."""
+    # Prime asyncpg's per-connection statement cache, which is keyed by the
+    # query text, so the first fetch() of each statement skips Parse. The
+    # public conn.prepare() bypasses that cache, so fetch() would parse the
+    # query again; _prepare(use_cache=True) is the only way to fill it.
+    for name, query in STATEMENTS.items():
+        extension = STATEMENT_EXTENSIONS.get(name)
+        if extension is None or extension in _extensions:
+            await conn._prepare(query, use_cache=True)
+
+
+def pool_max_size() -> int:
+    """
+    Connections this worker's pool may open: DB_POOL_MAX_SIZE, capped at an
+    even share of DB_CONNECTION_LIMIT across the workers when it is set.
+    """
+    if DB_CONNECTION_LIMIT <= 0:
+        return DB_POOL_MAX_SIZE
+    # Less each worker's LISTEN connection
+    share = (DB_CONNECTION_LIMIT - DB_CONNECTION_RESERVE) // WEB_CONCURRENCY - 1
+    return max(1, min(DB_POOL_MAX_SIZE, share))
+
+
+def pool_min_size() -> int:
+    """Connections this worker's pool keeps open."""
+    return min(DB_POOL_MIN_SIZE, pool_max_size())
+
+
+async def _create_pool(dsn: str):
+    """Create a connection pool using the configured sizing and timeouts."""
+    options = {
+        "min_size": pool_min_size(),
+        "max_size": pool_max_size(),
+        "max_inactive_connection_lifetime": DB_MAX_INACTIVE_LIFETIME,
+        "command_timeout": DB_COMMAND_TIMEOUT,
+    }
+    if statement_mode(dsn) == "pooler":
+        # Transaction poolers cannot keep named statements across queries
+        options["statement_cache_size"] = 0
+    else:
+        # Keep the primed statements for the connection's lifetime: room for
+        # every registered statement and some ad-hoc queries, and no expiry
+        options["statement_cache_size"] = len(STATEMENTS) + STATEMENT_CACHE_ADHOC
+        options["max_cached_statement_lifetime"] = 0
+        options["init"] = _prepare_statements
+    return await asyncpg.create_pool(dsn, **options)
+
+
+async def _connect(dsn: str):
+    """Open a single connection in the statement mode of its DSN."""
+    if statement_mode(dsn) == "pooler":
+        return await asyncpg.connect(dsn, statement_cache_size=0)
+    return await asyncpg.connect(dsn)
+
+
+async def _warm_pool():
+    """Touch min_size connections of each pool at once so none are idle-expired."""
+    async def ping(pool):
+        async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as conn:
+            await conn.fetchval("SELECT 1")
+
+    pools = [p for p in (_pool, _read_pool) if p]
+    await asyncio.gather(*(
+        ping(pool) for pool in pools for _ in range(pool_min_size())
+    ))
+
+
+def _in_business_hours() -> bool:
+    """Check whether the venue is open, in venue local time."""
+    local = datetime.now(timezone.utc) + timedelta(hours=BUSINESS_UTC_OFFSET)
+    return BUSINESS_HOURS_START <= local.hour < BUSINESS_HOURS_END
+
+
+async def _keepalive_loop():
+    """Ping the database during business hours so Neon never suspends."""
+    while True:
+        await asyncio.sleep(DB_KEEPALIVE_INTERVAL)
+        if not _in_business_hours():
+            continue
+        try:
+            await _warm_pool()
+        except Exception as e:
+            print(f"Database keepalive error: {e}")
+
+
+async def _partition_loop():
+    """Create next year's booking partition in good time, checked daily."""
+    while True:
+        await asyncio.sleep(24 * 60 * 60)
+        try:
+            async with get_connection() as conn:
+                if await bookings_partitioned(conn):
+                    await ensure_booking_partitions(conn)
+        except Exception as e:
+            print(f"Booking partition maintenance error: {e}")
 
 
 async def init_db():
     """Initialize database connection pool and create tables."""
-    global _pool
-    
+    global _pool, _read_pool, _keepalive_task, _partition_task
+
     if not DATABASE_URL:
         print("Warning: DATABASE_URL not configured")
         return False
-    
+
     try:
-        _pool = await asyncpg.create_pool(
-            DATABASE_URL,
-            min_size=1,
-            max_size=10
-        )
-        
-        # Initialize pgvector and create tables
-        async with _pool.acquire() as conn:
-            # Enable pgvector extension
-            await conn.execute('CREATE EXTENSION IF NOT EXISTS vector')
-            
-            # Create bookings table
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS bookings (
-                    id SERIAL PRIMARY KEY,
-                    customer_name VARCHAR(255) NOT NULL,
-                    customer_phone VARCHAR(20) NOT NULL,
-                    customer_email VARCHAR(255),
-                    event_type VARCHAR(100) NOT NULL,
-                    event_date DATE NOT NULL,
-                    guest_count INTEGER,
-                    package_type VARCHAR(100),
-                    special_requests TEXT,
-                    status VARCHAR(50) DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT NOW(),
-                    updated_at TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Create knowledge embeddings table
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS knowledge_embeddings (
-                    id SERIAL PRIMARY KEY,
-                    content TEXT NOT NULL,
-                    category VARCHAR(100),
-                    embedding vector(1024),
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Create index for vector similarity search
-            await conn.execute('''
-                CREATE INDEX IF NOT EXISTS knowledge_embedding_idx 
-                ON knowledge_embeddings 
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100)
-            ''')
-        
-        print("Database initialized successfully")
+        # Tables must exist before the pool prepares statements against them
+        # Workers starting together take turns. The lock is held by the
+        # session, so it uses the direct endpoint: through a transaction
+        # pooler it would stay on a pooled server connection after close.
+        conn = await _connect(DATABASE_LISTEN_URL)
+        try:
+            await conn.execute(f"SET lock_timeout = '{int(DB_SCHEMA_LOCK_TIMEOUT * 1000)}ms'")
+            await conn.execute('SELECT pg_advisory_lock($1, 0)', SCHEMA_LOCK_NAMESPACE)
+            await conn.execute('RESET lock_timeout')
+            await _create_schema(conn)
+        finally:
+            await conn.close()
+
+        _pool = await _create_pool(DATABASE_URL)
+        if DATABASE_READ_URL:
+            _read_pool = await _create_pool(DATABASE_READ_URL)
+        await _warm_pool()
+
+        if DB_KEEPALIVE_INTERVAL > 0:
+            _keepalive_task = asyncio.create_task(_keepalive_loop())
+        _partition_task = asyncio.create_task(_partition_loop())
+
+        replica = "with read replica" if _read_pool else "no read replica"
+        print(f"Database initialized successfully ({statement_mode()} statements, {replica})")
         return True
-        
+
     except Exception as e:
         print(f"Database initialization error: {e}")
         return False
 
 
 async def close_db():
-    """Close database connection pool."""
-    global _pool
+    """Close database connection pools."""
+    global _pool, _read_pool, _keepalive_task, _partition_task, _listen_conn
+    if _keepalive_task:
+        _keepalive_task.cancel()
+        _keepalive_task = None
+    if _partition_task:
+        _partition_task.cancel()
+        _partition_task = None
+    if _listen_conn:
+        conn, _listen_conn = _listen_conn, None
+        _channels.clear()
+        _reconnect_callbacks.clear()
+        await conn.close()
+    if _read_pool:
+        await _read_pool.close()
+        _read_pool = None
     if _pool:
         await _pool.close()
         _pool = None
 
 
+def _dispatch_notification(conn, pid, channel, payload):
+    """Fan a NOTIFY payload out to every subscriber of the channel."""
+    for callback in _channels.get(channel, []):
+        try:
+            callback(payload)
+        except Exception as e:
+            print(f"Notification handler error on {channel}: {e}")
+
+
+def _on_listener_lost(conn):
+    """Reconnect the LISTEN connection unless it was closed on purpose."""
+    if conn is _listen_conn:
+        asyncio.get_running_loop().create_task(_reconnect_listener())
+
+
+async def _connect_listener():
+    """Open the LISTEN connection and subscribe it to every known channel."""
+    global _listen_conn
+    conn = await asyncpg.connect(DATABASE_LISTEN_URL)
+    for channel in _channels:
+        await conn.add_listener(channel, _dispatch_notification)
+    conn.add_termination_listener(_on_listener_lost)
+    _listen_conn = conn
+    return conn
+
+
+async def _reconnect_listener():
+    """Re-establish LISTEN with backoff; subscribers resync as notifications may be lost."""
+    delay = 1
+    while _pool:
+        try:
+            await _connect_listener()
+            print("LISTEN connection re-established")
+            for callback in _reconnect_callbacks:
+                asyncio.create_task(callback())
+            return
+        except Exception as e:
+            print(f"LISTEN reconnect failed: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+async def listen(channel: str, callback, on_reconnect=None):
+    """
+    Subscribe callback(payload) to a NOTIFY channel.
+    All channels share one dedicated connection per process. on_reconnect
+    is awaited after that connection is lost and re-established.
+    """
+    if not _pool:
+        raise Exception("Database not initialized. Call init_db() first.")
+
+    first = channel not in _channels
+    _channels.setdefault(channel, []).append(callback)
+    if on_reconnect:
+        _reconnect_callbacks.append(on_reconnect)
+
+    if _listen_conn is None or _listen_conn.is_closed():
+        await _connect_listener()
+    elif first:
+        await _listen_conn.add_listener(channel, _dispatch_notification)
+
+
+def _recently_wrote() -> bool:
+    """Whether reads should stay on the primary to see the client's recent write."""
+    state = _write_state.get()
+    if state is None:
+        return False
+    if state["wrote"]:
+        return True
+    return time.time() - state["client"] < DB_READ_YOUR_WRITES_WINDOW
+
+
+class ReadYourWritesMiddleware:
+    """
+    Responses to requests that changed bookings carry the write time in the
+    Last-Write-At header. Requests that send it back read from the primary
+    until DB_READ_YOUR_WRITES_WINDOW has passed, so the client sees its own
+    change even while the replica lags.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = 0.0
+        for name, value in scope["headers"]:
+            if name == LAST_WRITE_HEADER.lower().encode():
+                try:
+                    client = min(float(value), time.time())
+                except ValueError:
+                    pass
+        state = {"client": client, "wrote": 0.0}
+        token = _write_state.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                header = (LAST_WRITE_HEADER.lower().encode(), f"{state['wrote']:.3f}".encode())
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _write_state.reset(token)
+
+
 @asynccontextmanager
-async def get_connection():
-    """Get a database connection from the pool."""
+async def get_connection(readonly: bool = False, use_primary: bool = False, track_write: bool = False):
+    """
+    Get a database connection from the pool.
+    Read-only callers are routed to the replica when one is configured,
+    unless the client changed bookings moments ago. Pass use_primary for
+    read-only work that cannot tolerate replica lag, and track_write for
+    booking changes the client's following reads must see.
+    """
     if not _pool:
         raise Exception("Database not initialized. Call init_db() first.")
-    
-    async with _pool.acquire() as conn:
+
+    if readonly and _read_pool and not use_primary and not _recently_wrote():
+        pool, name = _read_pool, "replica"
+    else:
+        pool, name = _pool, "primary"
+        state = _write_state.get()
+        if track_write and state is not None:
+            state["wrote"] = time.time()
+
+    stats = _acquire_stats[name]
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        stats["timeouts"] += 1
+        raise
+    waited = time.perf_counter() - started
+    stats["acquires"] += 1
+    stats["wait_total"] += waited
+    stats["wait_max"] = max(stats["wait_max"], waited)
+    metrics.DB_POOL_ACQUIRE_WAIT.labels(name).observe(waited)
+
+    try:
         yield conn
+    finally:
+        await pool.release(conn)
+
+
+async def check_pools(timeout: float) -> dict:
+    """
+    Acquire a connection from each pool and run one query within `timeout`
+    seconds, so a suspended compute or an exhausted pool shows up. Returns
+    {pool: {"ok", "latency_ms", "pgvector" or "error"}}.
+    """
+    async def query(pool):
+        async with pool.acquire() as conn:
+            return await fetchval(conn, "health_vector_version")
+
+    async def probe(pool):
+        started = time.perf_counter()
+        try:
+            version = await asyncio.wait_for(query(pool), timeout)
+            result = {"ok": True, "pgvector": version}
+        except Exception as e:
+            result = {"ok": False, "error": str(e) or type(e).__name__}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    pools = [(name, pool) for name, pool in (("primary", _pool), ("replica", _read_pool)) if pool]
+    results = await asyncio.gather(*(probe(pool) for _, pool in pools))
+    return {name: result for (name, _), result in zip(pools, results)}
+
+
+def pool_stats() -> dict:
+    """Pool occupancy and acquire wait statistics for each pool."""
+    result = {}
+    for name, pool in (("primary", _pool), ("replica", _read_pool)):
+        if name == "replica" and not pool:
+            continue
+        acquired = _acquire_stats[name]
+        acquires = acquired["acquires"]
+        stats = {
+            "configured_min": pool_min_size(),
+            "configured_max": pool_max_size(),
+            "size": 0,
+            "in_use": 0,
+            "idle": 0,
+            "acquires": acquires,
+            "acquire_timeouts": acquired["timeouts"],
+            "acquire_wait_avg_ms": round(acquired["wait_total"] / acquires * 1000, 3) if acquires else 0.0,
+            "acquire_wait_max_ms": round(acquired["wait_max"] * 1000, 3),
+        }
+        if pool:
+            stats["size"] = pool.get_size()
+            stats["idle"] = pool.get_idle_size()
+            stats["in_use"] = stats["size"] - stats["idle"]
+        result[name] = stats
+    return result
+
+
+def _statement_span(name: str):
+    """A client span for a registered statement, carrying its SQL."""
+    return tracing.span(f"db {name}", "CLIENT", **{
+        "db.system.name": "postgresql",
+        "db.operation.name": name,
+        "db.query.text": STATEMENTS[name],
+    })
+
+
+async def fetch(conn, name: str, *args):
+    """Run a registered statement and return all rows."""
+    with _statement_span(name):
+        return await conn.fetch(STATEMENTS[name], *args)
+
+
+async def fetchrow(conn, name: str, *args):
+    """Run a registered statement and return the first row."""
+    with _statement_span(name):
+        return await conn.fetchrow(STATEMENTS[name], *args)
+
+
+async def fetchval(conn, name: str, *args):
+    """Run a registered statement and return the first column of the first row."""
+    with _statement_span(name):
+        return await conn.fetchval(STATEMENTS[name], *args)
+
+
+async def execute(conn, name: str, *args) -> str:
+    """Run a registered statement and return its status tag."""
+    with _statement_span(name):
+        return await conn.execute(STATEMENTS[name], *args)
 
 
 async def get_pool():
@@ -98,6 +1064,16 @@ async def get_pool():
     return _pool
 
 
+def has_extension(name: str) -> bool:
+    """Check if an optional Postgres extension was available at startup."""
+    return name in _extensions
+
+
 def is_configured():
     """Check if database is configured."""
     return bool(DATABASE_URL)
+
+
+def is_available():
+    """Check if the database was initialized, i.e. its pool is open."""
+    return _pool is not None
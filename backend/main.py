@@ -1,13 +1,43 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 from config import FRONTEND_URL
 from routers.chat import router as chat_router
 from routers.bookings import router as bookings_router
 from models.schemas import HealthResponse
-from database import init_db, close_db, is_configured as db_configured
-from services.embeddings import is_configured as embeddings_configured
+import metrics
+from metrics import MetricsMiddleware
+import tracing
+from database import (
+    init_db, close_db, pool_stats, is_configured as db_configured,
+    ReadYourWritesMiddleware, LAST_WRITE_HEADER
+)
+from services.embeddings import is_configured as embeddings_configured, warm_up as warm_up_embeddings
+from services.chatbot import chatbot_service
+from services import admission, availability, changes, draining, health, idempotency, slots
+from services import booking as booking_service
+
+
+async def _finish_startup(db_ready: bool):
+    """
+    Startup work that may finish after the server is listening: bookings
+    read the database until the availability calendar is loaded, and the
+    model SDKs are loaded here rather than by the first chat.
+    """
+    try:
+        if db_ready:
+            backfill = await booking_service.backfill_phone_numbers()
+            if backfill["success"] and backfill["updated"]:
+                print(f"[OK] Normalized {backfill['updated']} phone numbers")
+            if await availability.start():
+                print("[OK] Availability calendar loaded")
+        await asyncio.gather(chatbot_service.warm_up(), warm_up_embeddings())
+        print("[OK] Model clients ready")
+    except Exception as e:
+        print(f"Background startup error: {e}")
 
 
 @asynccontextmanager
@@ -16,10 +46,16 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting Star Crescent Chatbot API...")
     
+    db_init = False
     if db_configured():
         db_init = await init_db()
         if db_init:
             print("[OK] Database connected and initialized")
+            if await slots.start():
+                print(f"[OK] {len(slots.active())} booking slots loaded")
+            if await changes.start():
+                print("[OK] Booking change feed listening")
+            idempotency.start()
         else:
             print("[ERROR] Database initialization failed")
     else:
@@ -30,12 +66,26 @@ async def lifespan(app: FastAPI):
     else:
         print("[WARNING] Cohere not configured (RAG features disabled)")
     
+    # A shutdown signal ends live streams at once; chats in flight may finish
+    draining.install(changes.end_streams)
+    
+    background = asyncio.create_task(_finish_startup(db_init))
+    
     yield
     
     # Shutdown
     print("Shutting down...")
+    background.cancel()
+    availability.stop()
+    changes.stop()
+    idempotency.stop()
     await close_db()
+    tracing.shutdown()
+    metrics.shutdown()
+
 
+# FastAPI opens request spans itself once a tracer provider is set
+tracing.setup()
 
 app = FastAPI(
     title="Star Crescent Chatbot API",
@@ -58,8 +108,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "Retry-After", LAST_WRITE_HEADER],
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(chat_router)
 app.include_router(bookings_router)
@@ -76,13 +130,25 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check: the process is up. Never touches dependencies."""
     return HealthResponse(
         status="healthy",
         timestamp=datetime.now().isoformat()
     )
 
 
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness check: probes the database, pgvector, Gemini and Cohere
+    (cached for a few seconds). 503 while the database is unavailable or
+    the server is shutting down.
+    """
+    result = await health.check()
+    result["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
 @app.get("/api/status")
 async def api_status():
     """Detailed API status with feature availability."""
@@ -94,10 +160,19 @@ async def api_status():
             "rag": embeddings_configured() and db_configured(),
             "bookings": db_configured()
         },
+        "database_pools": pool_stats(),
+        "chat_admission": admission.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics."""
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
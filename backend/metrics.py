@@ -0,0 +1,207 @@
+"""
+Prometheus Metrics
+HTTP request timings, model and embedding calls, cache hits, and (read at
+scrape time) database pool and chat admission state, served at /metrics.
+With several workers (PROMETHEUS_MULTIPROC_DIR set by serve.py) the
+metrics of every worker are added up; pool and admission state are those
+of the worker answering the scrape.
+"""
+import os
+import time
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST,
+    disable_created_metrics, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import tracing
+
+# The *_created series only add noise to every counter and histogram
+disable_created_metrics()
+
+HTTP_REQUESTS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled by route",
+    ["method", "route"],
+    multiprocess_mode="livesum"
+)
+
+# provider is "gemini" or "cohere"; operation names the call
+EXTERNAL_CALLS = Histogram(
+    "external_call_duration_seconds",
+    "Model and embedding API call duration",
+    ["provider", "operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+EXTERNAL_ERRORS = Counter(
+    "external_call_errors_total",
+    "Model and embedding API calls that failed",
+    ["provider", "operation"]
+)
+EXTERNAL_TOKENS = Counter(
+    "external_call_tokens_total",
+    "Tokens used by model and embedding API calls",
+    ["provider", "operation", "kind"]
+)
+
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Wait for a connection from the pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Lookups in in-memory caches",
+    ["cache", "result"]
+)
+
+
+def cache_lookup(cache: str, hits: int = 0, misses: int = 0):
+    """Count hits and misses of an in-memory cache."""
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+class ExternalCall:
+    """
+    Times a model or embedding API call, in a client span when tracing,
+    and counts it as an error if it raises. Use as
+    `async with ExternalCall("gemini", "chat") as call:` and report usage
+    with call.tokens(kind, n).
+    """
+
+    def __init__(self, provider: str, operation: str):
+        self.labels = (provider, operation)
+        self.span = tracing.span(f"{provider} {operation}", "CLIENT", **{"gen_ai.system": provider})
+
+    def tokens(self, kind: str, count: int):
+        if count:
+            EXTERNAL_TOKENS.labels(*self.labels, kind).inc(count)
+            tracing.set_attributes(**{f"gen_ai.usage.{kind}_tokens": count})
+
+    async def __aenter__(self):
+        self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        EXTERNAL_CALLS.labels(*self.labels).observe(time.perf_counter() - self.started)
+        if exc_type is not None:
+            EXTERNAL_ERRORS.labels(*self.labels).inc()
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _StateCollector:
+    """Database pool and chat admission state, read when scraped."""
+
+    def describe(self):
+        # Registering must not collect: database imports this module
+        return []
+
+    def collect(self):
+        from database import pool_stats
+        from services import admission
+
+        size = GaugeMetricFamily("db_pool_connections", "Connections in the pool", labels=["pool", "state"])
+        max_size = GaugeMetricFamily("db_pool_max_connections", "Pool size limit", labels=["pool"])
+        acquires = CounterMetricFamily("db_pool_acquires", "Connections acquired from the pool", labels=["pool"])
+        timeouts = CounterMetricFamily("db_pool_acquire_timeouts", "Pool acquires that timed out", labels=["pool"])
+        for pool, stats in pool_stats().items():
+            size.add_metric([pool, "in_use"], stats["in_use"])
+            size.add_metric([pool, "idle"], stats["idle"])
+            max_size.add_metric([pool], stats["configured_max"])
+            acquires.add_metric([pool], stats["acquires"])
+            timeouts.add_metric([pool], stats["acquire_timeouts"])
+        yield from (size, max_size, acquires, timeouts)
+
+        chats = admission.stats()
+        admitted = CounterMetricFamily("chat_admitted", "Chats admitted to the model")
+        admitted.add_metric([], chats["admitted"])
+        rejected = CounterMetricFamily("chat_rejected", "Chats turned away by admission control", labels=["reason"])
+        for reason in ("client_rate", "global_rate", "queue_full", "queue_timeout", "draining"):
+            rejected.add_metric([reason], chats[f"rejected_{reason}"])
+        load = GaugeMetricFamily("chat_admission", "Chats running and waiting for a place", labels=["state"])
+        load.add_metric(["running"], chats["running"])
+        load.add_metric(["waiting"], chats["waiting"])
+        yield from (admitted, rejected, load)
+
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+_state = _StateCollector()
+REGISTRY.register(_state)
+
+
+def _route(scope) -> str:
+    """The route template a request matched, so ids do not become labels."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request by method, route template and status. The
+    route is known once routing is done, so a request counts as in flight
+    from when it first reads its body or starts its response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = "500"
+        in_flight = None
+
+        def routed():
+            nonlocal in_flight
+            if in_flight is None:
+                in_flight = HTTP_IN_FLIGHT.labels(method, _route(scope))
+                in_flight.inc()
+
+        async def receive_routed():
+            routed()
+            return await receive()
+
+        async def send_with_status(message):
+            nonlocal status
+            routed()
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_routed, send_with_status)
+        finally:
+            HTTP_REQUESTS.labels(method, _route(scope), status).observe(time.perf_counter() - started)
+            if in_flight is not None:
+                in_flight.dec()
+
+
+def render():
+    """The current metrics in the Prometheus text format, with its content type."""
+    if not MULTIPROCESS:
+        return generate_latest(), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_state)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def shutdown():
+    """Drop this worker's live gauges from the shared metrics."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 class ChatMessage(BaseModel):
@@ -21,3 +21,53 @@ class ChatResponse(BaseModel):
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
+
+
+class Booking(BaseModel):
+    """A booking as returned by the API. Columns a query did not select are left unset."""
+    id: int
+    customer_name: str
+    customer_phone: Optional[str] = None
+    customer_email: Optional[str] = None
+    event_type: str
+    event_date: date
+    guest_count: Optional[int] = None
+    package_type: Optional[str] = None
+    special_requests: Optional[str] = None
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    slot_id: Optional[int] = None
+    slot: Optional[str] = None
+
+
+class BookingResponse(BaseModel):
+    success: bool
+    booking: Booking
+
+
+class BookingsResponse(BaseModel):
+    success: bool
+    bookings: List[Booking]
+
+
+class BookingListResponse(BaseModel):
+    success: bool
+    bookings: List[Booking]
+    total: Optional[int] = None
+    limit: int
+    offset: int
+    next_cursor: Optional[str] = None
+
+
+class BulkUpdateResponse(BaseModel):
+    success: bool
+    bookings: List[Booking]
+    not_found: List[int]
+    fully_booked: List[int]
+
+
+class MessageResponse(BaseModel):
+    success: bool
+    message: str
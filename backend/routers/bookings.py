@@ -1,12 +1,80 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.sse import EventSourceResponse, ServerSentEvent
 from datetime import datetime, date
-from typing import Optional
-from pydantic import BaseModel
+from typing import AsyncIterable, List, Optional
+from pydantic import BaseModel, Field
+from models.schemas import (
+    BookingResponse, BookingsResponse, BookingListResponse, BulkUpdateResponse, MessageResponse
+)
+from config import IMPORT_MAX_BYTES
+import tracing
 from services import booking as booking_service
+from services import booking_io, changes, idempotency, slots
 
 router = APIRouter(prefix="/api/bookings", tags=["bookings"])
 
 
+def _error_status(result: dict) -> int:
+    """Map a failed service result to an HTTP status code."""
+    error = result.get("error", "").lower()
+    if "not found" in error:
+        return 404
+    if "fully booked" in error or "in progress" in error:
+        return 409
+    if "modified since" in error:
+        return 412
+    if "invalid" in error or "no fields" in error:
+        return 400
+    if "not available" in error:
+        return 503
+    return 500
+
+
+def _entity_tags(header: Optional[str], weak: bool = True) -> List[str]:
+    """
+    Split an If-Match / If-None-Match header into bare tag values.
+    If-None-Match compares weakly, so W/ is dropped. If-Match compares
+    strongly (weak=False): a weak tag keeps its W/ and matches no ETag.
+    """
+    if not header:
+        return []
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        tags.append(tag.strip('"'))
+    return tags
+
+
+def _set_cache_headers(response: Response, etag: str):
+    """Label a response with its ETag and ask clients to revalidate it."""
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def _not_modified(etag: str) -> Response:
+    """Empty 304 response for a client that already has this ETag."""
+    response = Response(status_code=304)
+    _set_cache_headers(response, etag)
+    return response
+
+
+def _expected_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Booking version an If-Match header requires, or None for no condition.
+    A header that names no booking version can never match, so it fails with 412.
+    """
+    tags = _entity_tags(if_match, weak=False)
+    if not tags or tags == ["*"]:
+        return None
+    if len(tags) == 1 and tags[0].isdigit():
+        return int(tags[0])
+    raise HTTPException(status_code=412, detail="If-Match must be a single booking ETag")
+
+
 class BookingCreate(BaseModel):
     customer_name: str
     customer_phone: str
@@ -16,6 +84,7 @@ class BookingCreate(BaseModel):
     guest_count: Optional[int] = None
     package_type: Optional[str] = None
     special_requests: Optional[str] = None
+    slot: Optional[str] = None
 
 
 class BookingUpdate(BaseModel):
@@ -23,90 +92,319 @@ class BookingUpdate(BaseModel):
     guest_count: Optional[int] = None
     special_requests: Optional[str] = None
     status: Optional[str] = None
+    slot: Optional[str] = None
+
+
+class BookingBulkUpdate(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+    event_date: Optional[date] = None
+    guest_count: Optional[int] = None
+    special_requests: Optional[str] = None
+    status: Optional[str] = None
 
 
-@router.get("/")
+@router.get("/", response_model=BookingListResponse)
 async def get_all_bookings(
+    response: Response,
     status: Optional[str] = Query(None, description="Filter by status"),
     limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0, description="Deprecated, prefer cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(True, description="Also return the total matching count"),
+    q: Optional[str] = Query(None, min_length=2, max_length=100, description="Search name, phone, email and special requests"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get all bookings with optional filtering.
+    Pages are keyset-paginated; pass next_cursor back as cursor for the next page.
+    Search results (q) are ranked by relevance and paged with offset.
+    The ETag changes whenever any booking does; send it back as
+    If-None-Match to get a 304 while nothing has changed.
     """
+    known_revision = None
+    for tag in _entity_tags(if_none_match):
+        if tag.startswith("r") and tag[1:].isdigit():
+            known_revision = int(tag[1:])
+
     result = await booking_service.get_all_bookings(
         status_filter=status,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total,
+        search=q.strip() if q else None,
+        known_revision=known_revision
     )
 
     if not result["success"]:
-        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
+    etag = f"r{result['revision']}"
+    if result.get("not_modified"):
+        return _not_modified(etag)
+    _set_cache_headers(response, etag)
     return result
 
 
-@router.get("/{booking_id}")
-async def get_booking(booking_id: int):
+@router.post("/bulk", response_model=BulkUpdateResponse)
+async def bulk_update_bookings(update: BookingBulkUpdate):
+    """
+    Apply the same update (e.g. status) to many bookings at once.
+    Returns only the bookings that changed.
+    """
+    result = await booking_service.bulk_update_bookings(
+        booking_ids=update.ids,
+        event_date=update.event_date,
+        guest_count=update.guest_count,
+        special_requests=update.special_requests,
+        status=update.status
+    )
+
+    if not result["success"]:
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
+
+    return result
+
+
+@router.get("/stats")
+async def get_booking_stats():
+    """
+    Get booking counts by status, event type, month and guest count.
+    """
+    result = await booking_service.get_booking_stats()
+
+    if not result["success"]:
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
+
+    return result
+
+
+def _change_feed_cursor(
+    after: Optional[int] = Query(None, ge=0, description="Resume after this revision"),
+    last_event_id: Optional[str] = Header(None)
+) -> Optional[int]:
+    """Revision to resume the change feed from; Last-Event-ID wins over `after`."""
+    if not changes.is_running():
+        raise HTTPException(status_code=503, detail="Change feed is not available")
+    if last_event_id:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+        return int(last_event_id)
+    return after
+
+
+@router.get("/changes", response_class=EventSourceResponse)
+async def booking_changes(after: Optional[int] = Depends(_change_feed_cursor)) -> AsyncIterable[ServerSentEvent]:
+    """
+    Stream booking changes as Server-Sent Events.
+    Each "changes" event lists the bookings inserted, updated or deleted in
+    one revision. Its id is the revision, so a reconnecting EventSource
+    resumes where it left off. A "reset" event means the changes since then
+    are no longer kept and the list should be reloaded.
+    """
+    async for event in changes.stream(after):
+        yield ServerSentEvent(event=event["event"], id=str(event["revision"]), raw_data=event["data"])
+
+
+@router.get("/export")
+async def export_bookings(
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv or ndjson"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    from_date: Optional[date] = Query(None, alias="from", description="First event date"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last event date, inclusive")
+):
+    """
+    Stream every matching booking as CSV or NDJSON.
+    """
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"bookings-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    return StreamingResponse(
+        booking_io.export_bookings(format, status, from_date, to_date),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/import")
+async def import_bookings(
+    request: Request,
+    dry_run: bool = Query(False, description="Validate only, do not insert")
+):
+    """
+    Import bookings from a CSV request body (text/csv) with a header row.
+    Returns how many rows were imported and a per-line error report.
+    Bodies over IMPORT_MAX_BYTES are rejected with a 413.
+    """
+    too_large = HTTPException(status_code=413, detail=f"CSV must be at most {IMPORT_MAX_BYTES} bytes")
+    if int(request.headers.get("content-length") or 0) > IMPORT_MAX_BYTES:
+        raise too_large
+    # Read in chunks so a body without a Content-Length is capped too
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > IMPORT_MAX_BYTES:
+            raise too_large
+    try:
+        csv_text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+
+    result = await booking_io.import_bookings(csv_text, dry_run=dry_run)
+
+    if not result["success"]:
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
+
+    return result
+
+
+@router.get("/slots")
+async def get_slots():
+    """
+    Get the bookable slots and their capacity per date.
+    """
+    return {"success": True, "slots": [slots.describe(s) for s in slots.active()]}
+
+
+@router.get("/availability")
+async def get_availability_range(
+    from_date: date = Query(..., alias="from", description="First date (YYYY-MM-DD)"),
+    to_date: date = Query(..., alias="to", description="Last date (YYYY-MM-DD), inclusive"),
+    slot: Optional[str] = Query(None, description="Only this slot, e.g. lawn-evening")
+):
+    """
+    Get booked counts and free slots for every date in a range.
+    """
+    result = await booking_service.get_availability_range(from_date, to_date, slot)
+
+    if not result["success"]:
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
+
+    return result
+
+
+@router.get("/availability/next")
+async def find_available_dates(
+    after: Optional[date] = Query(None, description="Search dates after this one (default today)"),
+    count: int = Query(5, ge=1, le=31),
+    weekdays: Optional[str] = Query(None, description="Comma-separated weekdays, e.g. fri,sat,sun"),
+    slot: Optional[str] = Query(None, description="Only this slot, e.g. lawn-evening")
+):
+    """
+    Get the next dates that still have free slots.
+    """
+    try:
+        weekday_numbers = booking_service.parse_weekdays(weekdays.split(",") if weekdays else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await booking_service.find_available_dates(
+        after=after or date.today(),
+        count=count,
+        weekdays=weekday_numbers,
+        slot=slot
+    )
+
+    if not result["success"]:
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
+
+    return result
+
+
+@router.get("/{booking_id}", response_model=BookingResponse, response_model_exclude_unset=True)
+async def get_booking(
+    booking_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Get a specific booking by ID.
+    The ETag is the booking's version; If-None-Match with it returns 304.
     """
     result = await booking_service.get_booking_by_id(booking_id)
 
     if not result["success"]:
-        raise HTTPException(
-            status_code=404 if "not found" in result.get("error", "").lower() else 500,
-            detail=result.get("error", "Unknown error")
-        )
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
+    etag = str(result["booking"]["version"])
+    tags = _entity_tags(if_none_match)
+    if etag in tags or "*" in tags:
+        return _not_modified(etag)
+    _set_cache_headers(response, etag)
     return result
 
 
-@router.post("/")
-async def create_booking(booking: BookingCreate):
+@router.post("/", response_model=BookingResponse, response_model_exclude_unset=True)
+async def create_booking(
+    booking: BookingCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Create a new booking.
+    With an Idempotency-Key header, retries of the same request return the
+    original response (marked Idempotent-Replayed) instead of booking again.
     """
-    result = await booking_service.create_booking(
-        customer_name=booking.customer_name,
-        customer_phone=booking.customer_phone,
-        event_type=booking.event_type,
-        event_date=booking.event_date,
-        customer_email=booking.customer_email,
-        guest_count=booking.guest_count,
-        package_type=booking.package_type,
-        special_requests=booking.special_requests
-    )
+    async def create():
+        result = await booking_service.create_booking(
+            customer_name=booking.customer_name,
+            customer_phone=booking.customer_phone,
+            event_type=booking.event_type,
+            event_date=booking.event_date,
+            customer_email=booking.customer_email,
+            guest_count=booking.guest_count,
+            package_type=booking.package_type,
+            special_requests=booking.special_requests,
+            slot=booking.slot
+        )
+        if not result["success"]:
+            return _error_status(result), {"detail": result.get("error", "Unknown error")}
+        return 200, jsonable_encoder(result)
+
+    if idempotency_key is None:
+        status_code, body = await create()
+        return JSONResponse(body, status_code=status_code)
 
+    request_hash = idempotency.fingerprint(request.method, request.url.path, await request.body())
+    result = await idempotency.run("booking", idempotency_key, request_hash, create)
     if not result["success"]:
-        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+        headers = {"Retry-After": "1"} if _error_status(result) == 409 else None
+        raise HTTPException(status_code=_error_status(result), detail=result["error"], headers=headers)
 
-    return result
+    tracing.set_attributes(**{"idempotency.replayed": result["replayed"]})
+    headers = {"Idempotent-Replayed": "true"} if result["replayed"] else None
+    return JSONResponse(result["body"], status_code=result["status_code"], headers=headers)
 
 
-@router.put("/{booking_id}")
-async def update_booking(booking_id: int, booking: BookingUpdate):
+@router.put("/{booking_id}", response_model=BookingResponse, response_model_exclude_unset=True)
+async def update_booking(
+    booking_id: int,
+    booking: BookingUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None)
+):
     """
     Update an existing booking.
+    With If-Match set to the booking's ETag, the update fails with 412 if
+    someone else changed the booking first.
     """
     result = await booking_service.update_booking(
         booking_id=booking_id,
         event_date=booking.event_date,
         guest_count=booking.guest_count,
         special_requests=booking.special_requests,
-        status=booking.status
+        status=booking.status,
+        expected_version=_expected_version(if_match),
+        slot=booking.slot
     )
 
     if not result["success"]:
-        raise HTTPException(
-            status_code=404 if "not found" in result.get("error", "").lower() else 500,
-            detail=result.get("error", "Unknown error")
-        )
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
+    _set_cache_headers(response, str(result["booking"]["version"]))
     return result
 
 
-@router.delete("/{booking_id}")
+@router.delete("/{booking_id}", response_model=MessageResponse)
 async def delete_booking(booking_id: int):
     """
     Delete a booking permanently.
@@ -114,15 +412,12 @@ async def delete_booking(booking_id: int):
     result = await booking_service.delete_booking(booking_id)
 
     if not result["success"]:
-        raise HTTPException(
-            status_code=404 if "not found" in result.get("error", "").lower() else 500,
-            detail=result.get("error", "Unknown error")
-        )
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
     return result
 
 
-@router.get("/phone/{phone}")
+@router.get("/phone/{phone}", response_model=BookingsResponse, response_model_exclude_unset=True)
 async def get_bookings_by_phone(phone: str):
     """
     Get all bookings for a specific phone number.
@@ -130,25 +425,28 @@ async def get_bookings_by_phone(phone: str):
     result = await booking_service.get_booking_by_phone(phone)
 
     if not result["success"]:
-        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
     return result
 
 
 @router.get("/availability/{check_date}")
-async def check_availability(check_date: date):
+async def check_availability(
+    check_date: date,
+    slot: Optional[str] = Query(None, description="Only this slot, e.g. lawn-evening")
+):
     """
-    Check if a specific date is available for booking.
+    Check if a specific date, or one slot on it, is available for booking.
     """
-    result = await booking_service.check_availability(check_date)
+    result = await booking_service.check_availability(check_date, slot)
 
     if not result["success"]:
-        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
     return result
 
 
-@router.post("/{booking_id}/cancel")
+@router.post("/{booking_id}/cancel", response_model=BookingResponse, response_model_exclude_unset=True)
 async def cancel_booking(booking_id: int):
     """
     Cancel a booking.
@@ -156,9 +454,6 @@ async def cancel_booking(booking_id: int):
     result = await booking_service.cancel_booking(booking_id)
 
     if not result["success"]:
-        raise HTTPException(
-            status_code=404 if "not found" in result.get("error", "").lower() else 500,
-            detail=result.get("error", "Unknown error")
-        )
+        raise HTTPException(status_code=_error_status(result), detail=result.get("error", "Unknown error"))
 
     return result
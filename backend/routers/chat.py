@@ -1,29 +1,89 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
 from datetime import datetime
+from typing import Optional
 from models.schemas import ChatRequest, ChatResponse
-from services.chatbot import chatbot_service
+import tracing
+from services import admission, idempotency
+from services.chatbot import chatbot_service, ERROR_RESPONSE
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Handle chat messages and return AI-generated responses.
+    When the model cannot be reached the apology reply comes with a 503.
+    With an Idempotency-Key header, a retried message gets the original
+    reply back instead of asking the model again; 503 replies are not kept,
+    so their retries are answered afresh.
+    Messages over the rate limits get a 429, and a 503 when too many
+    chats are already waiting; both carry Retry-After.
     """
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
-    # Get response from chatbot service
-    response = await chatbot_service.get_response(
-        message=request.message,
-        conversation_history=request.conversation_history
-    )
+    # Rate limits are checked before the Idempotency-Key is claimed, so a
+    # flood is turned away without a database round trip
+    client = http_request.client.host if http_request.client else ""
+    admitted = admission.check_rate(client)
+    if not admitted["success"]:
+        raise HTTPException(
+            status_code=admitted["status_code"],
+            detail=admitted["error"],
+            headers={"Retry-After": str(admitted["retry_after"])}
+        )
+    
+    async def respond():
+        # Raised before any reply exists, so a rejection is not stored
+        # under the Idempotency-Key
+        with tracing.span("chat.admission"):
+            admitted = await admission.acquire()
+            tracing.set_attributes(**{"chat.admitted": admitted["success"]})
+        if not admitted["success"]:
+            raise HTTPException(
+                status_code=admitted["status_code"],
+                detail=admitted["error"],
+                headers={"Retry-After": str(admitted["retry_after"])}
+            )
+        try:
+            # Get response from chatbot service
+            response = await chatbot_service.get_response(
+                message=request.message,
+                conversation_history=request.conversation_history
+            )
+        finally:
+            admission.release()
+        body = ChatResponse(
+            response=response,
+            timestamp=datetime.now().isoformat()
+        ).model_dump()
+        return (503 if response == ERROR_RESPONSE else 200), body
     
-    return ChatResponse(
-        response=response,
-        timestamp=datetime.now().isoformat()
+    if idempotency_key is None:
+        status_code, body = await respond()
+        return JSONResponse(body, status_code=status_code)
+    
+    request_hash = idempotency.fingerprint(
+        http_request.method, http_request.url.path, await http_request.body()
     )
+    result = await idempotency.run("chat", idempotency_key, request_hash, respond)
+    if not result["success"] or result["replayed"]:
+        # No fresh reply, so it does not count against the rate limits
+        admission.refund(client)
+    if not result["success"]:
+        if "in progress" in result["error"]:
+            raise HTTPException(status_code=409, detail=result["error"], headers={"Retry-After": "1"})
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    tracing.set_attributes(**{"idempotency.replayed": result["replayed"]})
+    headers = {"Idempotent-Replayed": "true"} if result["replayed"] else None
+    return JSONResponse(result["body"], status_code=result["status_code"], headers=headers)
 
 
 @router.get("/chat/status")
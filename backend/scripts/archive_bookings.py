@@ -0,0 +1,52 @@
+"""
+Booking Archive Script
+Detaches the bookings partitions of past years into the booking_archive
+schema. Run it from cron, e.g. once a year in January.
+
+Usage: python archive_bookings.py [--before YEAR] [--dry-run]
+By default the last BOOKING_ARCHIVE_AFTER_YEARS years are kept. Archived
+tables can be saved with `pg_dump -n booking_archive` and then dropped.
+"""
+import asyncio
+import sys
+from datetime import date
+sys.path.insert(0, '..')
+
+from config import BOOKING_ARCHIVE_AFTER_YEARS
+from database import init_db, close_db
+from services.booking_archive import archive_bookings
+
+
+async def run_archive(before_year: int, dry_run: bool):
+    """Archive every year before `before_year` and print what moved."""
+    if not await init_db():
+        print("Error: Could not initialize database")
+        return False
+
+    try:
+        result = await archive_bookings(before_year, dry_run=dry_run)
+    finally:
+        await close_db()
+
+    if not result["success"]:
+        print(f"Error: {result['error']}")
+        return False
+
+    for partition in result["archived"]:
+        print(f"  {partition['year']}: {partition['bookings']} bookings -> {partition['table']}")
+    action = "Would archive" if dry_run else "Archived"
+    print(f"\n{action} {len(result['archived'])} years before {before_year}")
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    before = date.today().year - BOOKING_ARCHIVE_AFTER_YEARS
+    if "--before" in args:
+        try:
+            before = int(args[args.index("--before") + 1])
+        except (IndexError, ValueError):
+            print(__doc__)
+            sys.exit(2)
+    ok = asyncio.run(run_archive(before, "--dry-run" in args))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,84 @@
+"""
+Booking Contention Benchmark
+Fires many concurrent create_booking calls for one date and checks that
+no slot ends up with more bookings than its capacity.
+
+Usage: python bench_booking_contention.py [requests] [date]
+Run from the scripts directory against a disposable database.
+"""
+import asyncio
+import sys
+import time
+from datetime import date, datetime
+sys.path.insert(0, '..')
+
+from database import init_db, close_db, get_connection
+from services import slots
+from services.booking import create_booking
+
+BENCH_CUSTOMER = "Contention Benchmark"
+
+
+async def run_benchmark(requests: int, event_date: date):
+    """Create `requests` bookings concurrently for `event_date` and report."""
+    if not await init_db():
+        print("Error: Could not initialize database")
+        return False
+
+    try:
+        await slots.load()
+        capacities = slots.capacities()
+        async with get_connection() as conn:
+            await conn.execute(
+                "DELETE FROM bookings WHERE customer_name = $1", BENCH_CUSTOMER
+            )
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            create_booking(
+                customer_name=BENCH_CUSTOMER,
+                customer_phone=f"0300{i:07d}",
+                event_type="other",
+                event_date=event_date
+            )
+            for i in range(requests)
+        ))
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(1 for r in results if r["success"])
+        rejected = sum(1 for r in results if not r["success"] and "fully booked" in r["error"])
+        failed = requests - succeeded - rejected
+
+        async with get_connection() as conn:
+            rows = await conn.fetch('''
+                SELECT slot_id, COUNT(*) AS booked FROM bookings
+                WHERE event_date = $1 AND status NOT IN ('cancelled', 'rejected')
+                GROUP BY slot_id
+            ''', event_date)
+            await conn.execute(
+                "DELETE FROM bookings WHERE customer_name = $1", BENCH_CUSTOMER
+            )
+
+        print(f"Requests:        {requests} for {event_date.isoformat()}")
+        print(f"Elapsed:         {elapsed:.3f}s ({requests / elapsed:.0f} req/s)")
+        print(f"Succeeded:       {succeeded}")
+        print(f"Fully booked:    {rejected}")
+        print(f"Errors:          {failed}")
+        stored = {row["slot_id"]: row["booked"] for row in rows}
+        print(f"Active on date:  {sum(stored.values())} (capacity {sum(capacities.values())})")
+
+        overbooked = any(booked > capacities.get(slot_id, 0) for slot_id, booked in stored.items())
+        print("RESULT: OVERBOOKED" if overbooked else "RESULT: OK, no overbooking")
+        return not overbooked and failed == 0
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    target = (
+        datetime.strptime(sys.argv[2], "%Y-%m-%d").date()
+        if len(sys.argv) > 2 else date(2099, 12, 31)
+    )
+    ok = asyncio.run(run_benchmark(count, target))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,95 @@
+"""
+Booking List Serialization Benchmark
+Times GET /api/bookings/?limit=500 end to end through the ASGI app, and the
+service call on its own, so the share spent on JSON encoding is visible.
+
+Usage: python bench_serialize.py [iterations]
+Run from the scripts directory against a disposable database.
+"""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+sys.path.insert(0, '..')
+
+from database import init_db, close_db, get_connection
+from main import app
+from services.booking import get_all_bookings
+
+BENCH_CUSTOMER = "Serialize Benchmark"
+ROWS = 500
+PATH = f"/api/bookings/?limit={ROWS}&include_total=false"
+
+
+async def _request(path: str) -> bytes:
+    """Run one GET through the ASGI app and return the response body."""
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": url_path, "raw_path": url_path.encode(),
+        "query_string": query.encode(), "headers": [], "server": ("bench", 80),
+        "client": ("bench", 1234), "root_path": "",
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def _timed(label: str, iterations: int, call) -> float:
+    """Average milliseconds per call after one warm-up call."""
+    await call()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    elapsed = (time.perf_counter() - started) * 1000 / iterations
+    print(f"{label:<24}{elapsed:8.2f} ms")
+    return elapsed
+
+
+async def run_benchmark(iterations: int):
+    """Seed ROWS bookings, time the list endpoint, then clean up."""
+    if not await init_db():
+        print("Error: Could not initialize database")
+        return False
+
+    try:
+        async with get_connection() as conn:
+            await conn.execute("DELETE FROM bookings WHERE customer_name = $1", BENCH_CUSTOMER)
+            start = date(2090, 1, 1)
+            await conn.copy_records_to_table(
+                "bookings",
+                columns=["customer_name", "customer_phone", "customer_email", "event_type",
+                         "event_date", "guest_count", "package_type", "special_requests", "status"],
+                records=[
+                    (BENCH_CUSTOMER, f"0300{i:07d}", f"guest{i}@example.com", "wedding",
+                     start + timedelta(days=i // 2), 300 + i, "premium",
+                     "Stage decoration with fresh flowers and extra lighting", "confirmed")
+                    for i in range(ROWS)
+                ]
+            )
+
+        size = len(await _request(PATH))
+        print(f"Rows: {ROWS}, response size: {size} bytes, iterations: {iterations}")
+        service = await _timed("Service call", iterations, lambda: get_all_bookings(limit=ROWS, include_total=False))
+        endpoint = await _timed("Full request", iterations, lambda: _request(PATH))
+        print(f"{'Encoding overhead':<24}{endpoint - service:8.2f} ms")
+
+        async with get_connection() as conn:
+            await conn.execute("DELETE FROM bookings WHERE customer_name = $1", BENCH_CUSTOMER)
+        return True
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ok = asyncio.run(run_benchmark(count))
+    sys.exit(0 if ok else 1)
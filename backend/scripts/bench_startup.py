@@ -0,0 +1,121 @@
+"""
+Cold Start Benchmark
+Measures, over several cold starts of serve.py:
+- import time of main (the app module and everything it loads)
+- time to listen: from spawning the server to its first /health response
+- time to first chat: from spawning to the first successful /api/chat
+  (skipped when GEMINI_API_KEY is not set)
+Exits with status 1 if a median exceeds its budget, so it can guard
+against startup regressions.
+
+Usage: python bench_startup.py [runs]
+Run from the scripts directory; set DATABASE_URL to include database
+startup in the time to listen.
+"""
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PORT = 8791
+
+# Budgets in seconds for the medians
+IMPORT_BUDGET = 0.8
+LISTEN_BUDGET = 5.0
+FIRST_CHAT_BUDGET = 15.0
+
+
+def measure_import() -> float:
+    """Seconds to import main in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd="..", capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _request(path: str, body: dict = None):
+    """Status and JSON body of a request, or None if the server is not up."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}{path}", data=data,
+        headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def measure_server(chat: bool):
+    """Seconds from spawning serve.py to listening, and to the first chat."""
+    env = {**os.environ, "WEB_CONCURRENCY": "1", "PORT": str(PORT)}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py"], cwd="..", env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while _request("/health") is None:
+            if time.perf_counter() - started > 60:
+                raise RuntimeError("server did not start")
+            time.sleep(0.02)
+        listening = time.perf_counter() - started
+
+        first_chat = None
+        if chat:
+            while True:
+                result = _request("/api/chat", {"message": "What are your working hours?"})
+                if result and result[0] == 200:
+                    break
+                if time.perf_counter() - started > 60:
+                    raise RuntimeError("no successful chat")
+                time.sleep(0.5)
+            first_chat = time.perf_counter() - started
+        return listening, first_chat
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+
+def _report(name: str, samples: list, budget: float) -> bool:
+    median = statistics.median(samples)
+    within = median <= budget
+    print(
+        f"{name:<16} median {median:6.3f}s  min {min(samples):6.3f}s  "
+        f"max {max(samples):6.3f}s  budget {budget:g}s  {'ok' if within else 'OVER BUDGET'}"
+    )
+    return within
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    chat = bool(os.getenv("GEMINI_API_KEY"))
+
+    imports, listens, chats = [], [], []
+    for _ in range(runs):
+        imports.append(measure_import())
+        listening, first_chat = measure_server(chat)
+        listens.append(listening)
+        if first_chat is not None:
+            chats.append(first_chat)
+
+    ok = _report("import main", imports, IMPORT_BUDGET)
+    ok = _report("time to listen", listens, LISTEN_BUDGET) and ok
+    if chats:
+        ok = _report("first chat", chats, FIRST_CHAT_BUDGET) and ok
+    else:
+        print("first chat       skipped (GEMINI_API_KEY not set)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Worker Throughput Benchmark
+Starts serve.py with 1, 2 and 4 workers in turn and drives each with
+concurrent keep-alive clients fetching a year of availability (JSON
+encoding heavy) and a page of bookings, then reports requests per second
+and latency percentiles.
+
+Usage: python bench_workers.py [seconds] [connections] [workers ...]
+Run from the scripts directory with DATABASE_URL set.
+"""
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+PORT = 8790
+PATHS = [
+    f"/api/bookings/availability?from={date.today()}&to={date.today() + timedelta(days=365)}",
+    "/api/bookings/?limit=50",
+]
+
+
+async def _get(reader, writer, path: str) -> int:
+    """Send one keep-alive GET and read the response. Returns the status."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(deadline: float, offset: int, latencies: list, errors: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await _get(reader, writer, PATHS[i % len(PATHS)])
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def _wait_ready(timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            status = await _get(reader, writer, "/health")
+            writer.close()
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def run_benchmark(workers: int, seconds: float, connections: int):
+    """Benchmark serve.py with `workers` processes and print one result line."""
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(PORT)}
+    server = subprocess.Popen(
+        [sys.executable, "serve.py"], cwd="..", env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not await _wait_ready():
+            print(f"{workers} worker(s): server did not start")
+            return
+        # Warm up every worker's pool and caches
+        await asyncio.gather(*(_client(time.perf_counter() + 2, i, [], []) for i in range(connections)))
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client(started + seconds, i, latencies, errors) for i in range(connections)
+        ))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(
+            f"{workers} worker(s): {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  errors {len(errors)}"
+        )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+
+async def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    counts = [int(n) for n in sys.argv[3:]] or [1, 2, 4]
+
+    print(f"{connections} connections, {seconds:g}s per run, {os.cpu_count()} CPUs")
+    for workers in counts:
+        await run_benchmark(workers, seconds, connections)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Booking Import Script
+Loads bookings from a CSV file (e.g. the old spreadsheet) with COPY
+
+Usage: python import_bookings.py bookings.csv [--dry-run]
+Columns: customer_name, customer_phone, event_type, event_date (required),
+customer_email, guest_count, package_type, special_requests, status, slot
+"""
+import asyncio
+import sys
+sys.path.insert(0, '..')
+
+from database import init_db, close_db
+from services import slots
+from services.booking_io import import_bookings
+
+
+async def run_import(path: str, dry_run: bool):
+    """Import the CSV file at `path` and print the report."""
+    if not await init_db():
+        print("Error: Could not initialize database")
+        return False
+
+    try:
+        await slots.load()
+        with open(path, encoding="utf-8-sig") as f:
+            result = await import_bookings(f.read(), dry_run=dry_run)
+    finally:
+        await close_db()
+
+    if not result["success"]:
+        print(f"Error: {result['error']}")
+        return False
+
+    for error in result["errors"]:
+        print(f"  line {error['line']}: {error['error']}")
+    action = "Validated" if dry_run else "Imported"
+    count = result["valid"] if dry_run else result["imported"]
+    print(f"\n{action} {count} bookings, rejected {result['rejected']}")
+    return result["rejected"] == 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    ok = asyncio.run(run_import(sys.argv[1], "--dry-run" in sys.argv[2:]))
+    sys.exit(0 if ok else 1)
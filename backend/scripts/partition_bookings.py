@@ -0,0 +1,111 @@
+"""
+Bookings Partitioning Migration
+Rebuilds a plain bookings table, from before partitioning, as a table
+partitioned by event_date year and copies every booking across. Ids,
+versions and the booking stats are kept as they are.
+
+Stop the API first: bookings written during the copy would be lost.
+
+Usage: python partition_bookings.py [--drop-old]
+The old table is kept as bookings_unpartitioned unless --drop-old is given.
+"""
+import asyncio
+import sys
+sys.path.insert(0, '..')
+
+import asyncpg
+from config import DATABASE_URL
+from database import (
+    init_db, close_db, create_bookings_table, bookings_partitioned, ensure_booking_partitions
+)
+
+OLD_TABLE = "bookings_unpartitioned"
+
+
+async def _migrate(conn) -> bool:
+    """Swap in the partitioned table in one transaction. False if nothing to do."""
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE bookings IN ACCESS EXCLUSIVE MODE")
+        if await bookings_partitioned(conn):
+            return False
+
+        first_year = await conn.fetchval(
+            "SELECT EXTRACT(YEAR FROM MIN(event_date))::integer FROM bookings"
+        )
+        columns = [row["attname"] for row in await conn.fetch('''
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = 'bookings'::regclass AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        ''')]
+
+        # Move the old table and everything named after it out of the way,
+        # so the partitioned table gets the usual names
+        sequence = await conn.fetchval("SELECT pg_get_serial_sequence('bookings', 'id')")
+        await conn.execute(f"ALTER TABLE bookings RENAME TO {OLD_TABLE}")
+        await conn.execute(f"ALTER SEQUENCE {sequence} RENAME TO {OLD_TABLE}_id_seq")
+        indexes = await conn.fetch(
+            "SELECT indexname FROM pg_indexes WHERE tablename = $1", OLD_TABLE
+        )
+        for row in indexes:
+            await conn.execute(f'ALTER INDEX "{row["indexname"]}" RENAME TO "{row["indexname"][:48]}_unpartitioned"')
+        # Its triggers would otherwise still update the stats and change log
+        triggers = await conn.fetch(
+            f"SELECT tgname FROM pg_trigger WHERE tgrelid = '{OLD_TABLE}'::regclass AND NOT tgisinternal"
+        )
+        for row in triggers:
+            await conn.execute(f'DROP TRIGGER "{row["tgname"]}" ON {OLD_TABLE}')
+
+        await create_bookings_table(conn)
+        await ensure_booking_partitions(conn, first_year)
+
+        # Indexes and triggers are created afterwards by init_db, so the
+        # copy neither pays for index maintenance nor counts bookings twice
+        column_list = ", ".join(columns)
+        await conn.execute(
+            f"INSERT INTO bookings ({column_list}) SELECT {column_list} FROM {OLD_TABLE}"
+        )
+        await conn.execute(
+            "SELECT setval(pg_get_serial_sequence('bookings', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM bookings"
+        )
+
+        copied = await conn.fetchval("SELECT COUNT(*) FROM bookings")
+        original = await conn.fetchval(f"SELECT COUNT(*) FROM {OLD_TABLE}")
+        if copied != original:
+            raise Exception(f"Copied {copied} of {original} bookings, rolled back")
+        print(f"Copied {copied} bookings into the partitioned table")
+        return True
+
+
+async def run_migration(drop_old: bool):
+    """Partition bookings, then create its indexes and triggers."""
+    if not DATABASE_URL:
+        print("Error: DATABASE_URL not configured")
+        return False
+
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if not await _migrate(conn):
+            print("bookings is already partitioned")
+            return True
+        if drop_old:
+            await conn.execute(f"DROP TABLE {OLD_TABLE}")
+            print(f"Dropped {OLD_TABLE}")
+        else:
+            print(f"Kept the old table as {OLD_TABLE}; drop it once satisfied")
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+    finally:
+        await conn.close()
+
+    if not await init_db():
+        print("Error: Could not initialize database")
+        return False
+    await close_db()
+    print("Indexes and triggers created")
+    return True
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(run_migration("--drop-old" in sys.argv[1:]))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,38 @@
+"""
+Production Server
+Runs the API under uvicorn with WEB_CONCURRENCY worker processes. Each
+worker runs the full lifespan (its own pools, sized by DB_CONNECTION_LIMIT,
+and LISTEN connection); on SIGTERM every worker drains and gets
+SHUTDOWN_GRACE_SECONDS to finish its requests. Client addresses are taken
+from X-Forwarded-For when the request comes from FORWARDED_ALLOW_IPS.
+
+Usage: python serve.py
+"""
+import os
+import shutil
+import tempfile
+import uvicorn
+from config import WEB_CONCURRENCY, PORT, SHUTDOWN_GRACE_SECONDS, FORWARDED_ALLOW_IPS
+
+
+def _prepare_metrics_dir():
+    """Give the workers an empty directory to share Prometheus metrics through."""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.path.join(tempfile.gettempdir(), "prometheus-metrics")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+if __name__ == "__main__":
+    if WEB_CONCURRENCY > 1:
+        _prepare_metrics_dir()
+    print(f"Serving on port {PORT} with {WEB_CONCURRENCY} worker(s)")
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        timeout_graceful_shutdown=SHUTDOWN_GRACE_SECONDS,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+    )
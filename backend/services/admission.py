@@ -0,0 +1,190 @@
+"""
+Chat Admission Control
+Token buckets limit how often each client, and all clients together, may
+ask the model. A concurrency gate caps the chats running at once; a few
+more may wait briefly for a place, and the rest are turned away at once
+so a spike cannot exhaust the model quota or the database pool.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from config import (
+    CHAT_RATE_PER_CLIENT, CHAT_BURST_PER_CLIENT, CHAT_RATE_GLOBAL, CHAT_BURST_GLOBAL,
+    CHAT_MAX_CONCURRENCY, CHAT_QUEUE_SIZE, CHAT_QUEUE_TIMEOUT, WEB_CONCURRENCY
+)
+from services import draining
+
+CLIENT_RATE_MESSAGE = "Too many messages. Please wait a moment before sending another."
+GLOBAL_RATE_MESSAGE = "The assistant is receiving too many messages right now. Please try again shortly."
+BUSY_MESSAGE = "The assistant is busy right now. Please try again shortly."
+DRAINING_MESSAGE = "The server is restarting. Please try again shortly."
+
+# Client buckets kept before the idle (full) ones are dropped
+MAX_CLIENT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token. Returns 0 if one was free, else seconds until one is."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give(self):
+        """Return a token that was taken."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+# This worker's share of the server-wide limits, like the pool's share of
+# DB_CONNECTION_LIMIT. Per-client limits are not split: a client's
+# keep-alive connection usually stays with one worker.
+GLOBAL_RATE = CHAT_RATE_GLOBAL / WEB_CONCURRENCY
+GLOBAL_BURST = max(1.0, CHAT_BURST_GLOBAL / WEB_CONCURRENCY)
+MAX_CONCURRENCY = max(1, CHAT_MAX_CONCURRENCY // WEB_CONCURRENCY) if CHAT_MAX_CONCURRENCY > 0 else 0
+QUEUE_SIZE = -(-CHAT_QUEUE_SIZE // WEB_CONCURRENCY)
+
+_global: Optional[TokenBucket] = TokenBucket(GLOBAL_RATE, GLOBAL_BURST) if GLOBAL_RATE > 0 else None
+_clients: Dict[str, TokenBucket] = {}
+
+# Chats running, and waiters for a place in the order they arrived
+_running = 0
+_waiting: Deque[asyncio.Future] = deque()
+
+_counters = {
+    "admitted": 0,
+    "queued": 0,
+    "rejected_client_rate": 0,
+    "rejected_global_rate": 0,
+    "rejected_queue_full": 0,
+    "rejected_queue_timeout": 0,
+    "rejected_draining": 0,
+}
+
+
+def _client_bucket(client: str) -> TokenBucket:
+    bucket = _clients.get(client)
+    if bucket is None:
+        if len(_clients) >= MAX_CLIENT_BUCKETS:
+            for idle in [c for c, b in _clients.items() if b.full()]:
+                del _clients[idle]
+        bucket = _clients[client] = TokenBucket(CHAT_RATE_PER_CLIENT, CHAT_BURST_PER_CLIENT)
+    return bucket
+
+
+def _rejected(reason: str, status_code: int, error: str, retry_after: float) -> Dict:
+    _counters[f"rejected_{reason}"] += 1
+    return {
+        "success": False,
+        "status_code": status_code,
+        "error": error,
+        "retry_after": max(1, math.ceil(retry_after))
+    }
+
+
+def check_rate(client: str) -> Dict:
+    """
+    Take a token for a chat from `client` (its IP address). Rate limited
+    chats fail with a 429, with the seconds to wait in `retry_after`. While
+    the server drains for shutdown every chat fails with a 503. Checked
+    before the Idempotency-Key is claimed, so a flood is turned away
+    without touching the database.
+    """
+    if draining.is_draining():
+        return _rejected("draining", 503, DRAINING_MESSAGE, 1)
+
+    if CHAT_RATE_PER_CLIENT > 0:
+        wait = _client_bucket(client).take()
+        if wait:
+            return _rejected("client_rate", 429, CLIENT_RATE_MESSAGE, wait)
+    if _global is not None:
+        wait = _global.take()
+        if wait:
+            return _rejected("global_rate", 429, GLOBAL_RATE_MESSAGE, wait)
+    return {"success": True}
+
+
+def refund(client: str):
+    """Return the tokens taken by check_rate() for a chat that was not answered afresh."""
+    if CHAT_RATE_PER_CLIENT > 0 and client in _clients:
+        _clients[client].give()
+    if _global is not None:
+        _global.give()
+
+
+async def acquire() -> Dict:
+    """
+    Take a place for a chat that passed check_rate(). On success the caller
+    must call release() when the chat is done. A full gate fails with a
+    503 and the seconds to wait in `retry_after`.
+    """
+    global _running
+
+    if MAX_CONCURRENCY <= 0 or (_running < MAX_CONCURRENCY and not _waiting):
+        _running += 1
+        _counters["admitted"] += 1
+        return {"success": True}
+
+    if len(_waiting) >= QUEUE_SIZE:
+        return _rejected("queue_full", 503, BUSY_MESSAGE, CHAT_QUEUE_TIMEOUT)
+
+    # Wait for release() to hand over its place
+    _counters["queued"] += 1
+    place = asyncio.get_running_loop().create_future()
+    _waiting.append(place)
+    try:
+        await asyncio.wait_for(asyncio.shield(place), CHAT_QUEUE_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if place.done() and not place.cancelled():
+            # Handed a place just as the wait ended; pass it on
+            release()
+        else:
+            place.cancel()
+            _waiting.remove(place)
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        return _rejected("queue_timeout", 503, BUSY_MESSAGE, CHAT_QUEUE_TIMEOUT)
+    _counters["admitted"] += 1
+    return {"success": True}
+
+
+def release():
+    """Free an admitted chat's place, handing it to the next waiter."""
+    global _running
+    while _waiting:
+        place = _waiting.popleft()
+        if not place.done():
+            place.set_result(None)
+            return
+    _running -= 1
+
+
+def stats() -> Dict:
+    """Admission counters and current load."""
+    return {
+        **_counters,
+        "running": _running,
+        "waiting": len(_waiting),
+        "clients": len(_clients),
+        "max_concurrency": MAX_CONCURRENCY,
+        "queue_size": QUEUE_SIZE,
+    }
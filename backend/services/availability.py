@@ -0,0 +1,185 @@
+"""
+Availability Calendar
+In-memory active booking counts per slot and date for the coming months.
+Loaded from the slot_bookings occupancy table with one query, updated
+write-through by the booking service and kept in sync across workers with
+LISTEN/NOTIFY.
+"""
+import asyncio
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import AVAILABILITY_CALENDAR_MONTHS
+from database import get_connection, listen, fetch
+
+CHANNEL = "booking_calendar"
+
+# Counts are only kept for roughly the next AVAILABILITY_CALENDAR_MONTHS
+_DAYS = AVAILABILITY_CALENDAR_MONTHS * 31
+
+# _counts[slot_id][i] is the number of active bookings in the slot on
+# _start + i days
+_start: Optional[date] = None
+_counts: Dict[int, array] = {}
+
+# Dates named by notifications, refreshed together by one task
+_pending_dates = set()
+_refresh_task = None
+_reload_task = None
+
+
+def is_loaded() -> bool:
+    """Check if the calendar is loaded and covers today."""
+    return _start is not None and _start <= date.today()
+
+
+def covers(first: date, last: date) -> bool:
+    """Check if every date from first to last is held in memory."""
+    if not is_loaded():
+        return False
+    return first >= _start and (last - _start).days < _DAYS
+
+
+def get(day: date) -> Optional[Dict[int, int]]:
+    """
+    Active bookings on a date as {slot_id: booked}, leaving out empty
+    slots, or None if the date is not held in memory.
+    """
+    if not covers(day, day):
+        return None
+    index = (day - _start).days
+    return {slot_id: counts[index] for slot_id, counts in _counts.items() if counts[index]}
+
+
+def free_places(booked: Dict[int, int], capacities: Dict[int, int]) -> int:
+    """Places left in the given slots, from their booked counts."""
+    return sum(max(capacity - booked.get(slot_id, 0), 0) for slot_id, capacity in capacities.items())
+
+
+def find_free(
+    after: date,
+    count: int,
+    capacities: Dict[int, int],
+    weekdays: Optional[List[int]] = None,
+    horizon: int = 366
+) -> Optional[List[Tuple[date, Dict[int, int]]]]:
+    """
+    Up to `count` dates after `after` (within `horizon` days) with room in
+    any of the slots in `capacities` ({slot_id: capacity}), as (date, booked
+    per slot) pairs. Returns None when the search runs past the dates held
+    in memory before finishing.
+    """
+    found = []
+    day = after + timedelta(days=1)
+    last = after + timedelta(days=horizon)
+    while day <= last and len(found) < count:
+        booked = get(day)
+        if booked is None:
+            return None
+        if free_places(booked, capacities) and (not weekdays or day.isoweekday() in weekdays):
+            found.append((day, booked))
+        day += timedelta(days=1)
+    return found
+
+
+def _slot_counts(slot_id: int) -> array:
+    if slot_id not in _counts:
+        _counts[slot_id] = array("H", bytes(2 * _DAYS))
+    return _counts[slot_id]
+
+
+def adjust(day: date, slot_id: Optional[int], delta: int):
+    """Apply a local write to the calendar (write-through)."""
+    if slot_id is not None and covers(day, day):
+        counts = _slot_counts(slot_id)
+        index = (day - _start).days
+        counts[index] = max(counts[index] + delta, 0)
+
+
+async def load():
+    """(Re)load counts from today for the configured number of months."""
+    global _start, _counts
+    start = date.today()
+    end = start + timedelta(days=_DAYS - 1)
+
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        rows = await fetch(conn, "slot_bookings_in_range", start, end)
+
+    counts = {}
+    for row in rows:
+        if row["slot_id"] not in counts:
+            counts[row["slot_id"]] = array("H", bytes(2 * _DAYS))
+        counts[row["slot_id"]][(row["event_date"] - start).days] = row["booked"]
+    _start, _counts = start, counts
+
+
+async def refresh(days: Iterable[date]):
+    """Re-read the authoritative counts for specific dates."""
+    days = [d for d in days if covers(d, d)]
+    if not days:
+        return
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        rows = await fetch(conn, "slot_bookings_for_dates", days)
+    if not covers(min(days), max(days)):
+        return
+    for day in days:
+        index = (day - _start).days
+        for counts in _counts.values():
+            counts[index] = 0
+    for row in rows:
+        _slot_counts(row["slot_id"])[(row["event_date"] - _start).days] = row["booked"]
+
+
+async def _refresh_pending():
+    """Refresh every date named by notifications received so far."""
+    global _refresh_task
+    try:
+        while _pending_dates:
+            days = list(_pending_dates)
+            _pending_dates.clear()
+            await refresh(days)
+    except Exception as e:
+        print(f"Availability refresh error: {e}")
+    finally:
+        _refresh_task = None
+
+
+def _on_notify(payload: str):
+    """Queue the dates from a booking_calendar notification for refresh."""
+    global _refresh_task
+    for value in payload.split(","):
+        _pending_dates.add(date.fromisoformat(value))
+    if _refresh_task is None:
+        _refresh_task = asyncio.get_running_loop().create_task(_refresh_pending())
+
+
+async def _reload_daily():
+    """Roll the window forward once a day and correct any drift."""
+    while True:
+        await asyncio.sleep(24 * 60 * 60)
+        try:
+            await load()
+        except Exception as e:
+            print(f"Availability reload error: {e}")
+
+
+async def start() -> bool:
+    """Load the calendar and subscribe to changes from other workers."""
+    global _reload_task
+    try:
+        await listen(CHANNEL, _on_notify, on_reconnect=load)
+        await load()
+        _reload_task = asyncio.create_task(_reload_daily())
+        return True
+    except Exception as e:
+        print(f"Availability calendar error: {e}")
+        return False
+
+
+def stop():
+    """Stop background reloads and forget the calendar."""
+    global _reload_task, _start
+    if _reload_task:
+        _reload_task.cancel()
+        _reload_task = None
+    _start = None
@@ -2,11 +2,102 @@
 Booking Service for Star Crescent Marriage Lawn
 Handles booking creation, retrieval, and management
 """
-from datetime import date, datetime
-from typing import Optional, List, Dict, Any
-from database import get_connection, is_configured
+import base64
+import time
+from datetime import date, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+from config import AVAILABILITY_CACHE_TTL, AVAILABILITY_MAX_RANGE_DAYS
+from database import get_connection, is_configured, has_extension, fetch, fetchrow, fetchval
+from metrics import cache_lookup
+from tracing import traced
+from models.schemas import Booking
+from services import availability, slots
+from services.phone import normalize_phone
+from statements import INACTIVE_STATUSES
 
+FULLY_BOOKED_MESSAGE = "This date is fully booked. Please try another date."
+SLOT_FULLY_BOOKED_MESSAGE = "This slot is fully booked on this date. Please try another slot or date."
+VERSION_CONFLICT_MESSAGE = "Booking was modified since it was read. Reload it and try again."
 
+# ISO weekday numbers accepted by find_available_dates
+WEEKDAYS = {
+    "monday": 1, "tuesday": 2, "wednesday": 3, "thursday": 4,
+    "friday": 5, "saturday": 6, "sunday": 7,
+}
+
+# Guest-count buckets of the booking stats, in display order
+GUEST_COUNT_BUCKETS = ["0-99", "100-299", "300-499", "500-799", "800+", "unknown"]
+
+# How far ahead find_available_dates searches
+AVAILABLE_DATES_HORIZON_DAYS = 366
+
+# Columns that make up a serialized booking; anything else a query returns
+# (totals, previous values) is left out
+BOOKING_FIELDS = frozenset(Booking.model_fields)
+
+# Active bookings per month: (year, month) -> (loaded_at, {date: {slot_id: booked}})
+_month_cache: Dict[Tuple[int, int], Tuple[float, Dict[date, Dict[int, int]]]] = {}
+
+
+def _invalidate_months(*dates: Optional[date]):
+    """Drop cached availability for the months containing these dates."""
+    for d in dates:
+        if d is not None:
+            _month_cache.pop((d.year, d.month), None)
+
+
+def record_change(
+    previous_date: Optional[date],
+    previous_status: Optional[str],
+    previous_slot: Optional[int],
+    new_date: Optional[date],
+    new_status: Optional[str],
+    new_slot: Optional[int]
+):
+    """Write a booking change through to the availability calendar and caches."""
+    if previous_date is not None and previous_status not in INACTIVE_STATUSES:
+        availability.adjust(previous_date, previous_slot, -1)
+    if new_date is not None and new_status not in INACTIVE_STATUSES:
+        availability.adjust(new_date, new_slot, 1)
+    _invalidate_months(previous_date, new_date)
+
+
+def parse_slot(value: Optional[str]) -> Optional[int]:
+    """
+    Resolve a slot code ("lawn-evening"), name ("evening") or id to a slot
+    id. Raises ValueError if no active slot matches.
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    slot = slots.resolve(value)
+    if not slot:
+        names = ", ".join(slots.code(s) for s in slots.active())
+        raise ValueError(f"Invalid slot: {value} (slots: {names})")
+    return slot["id"]
+
+
+def serialize_bookings(rows: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Convert booking rows to dicts of their booking columns.
+    Dates stay date objects; the response encoder writes them as ISO strings.
+    """
+    if not rows:
+        return []
+    columns = [key for key in rows[0].keys() if key in BOOKING_FIELDS]
+    bookings = [{key: row[key] for key in columns} for row in rows]
+    if "slot_id" in columns:
+        for booking in bookings:
+            slot = slots.get(booking["slot_id"])
+            booking["slot"] = slots.code(slot) if slot else None
+    return bookings
+
+
+def serialize_booking(row: Any) -> Dict[str, Any]:
+    """Convert a single booking row to a dict, see serialize_bookings."""
+    return serialize_bookings([row])[0]
+
+
+@traced("booking.create_booking")
 async def create_booking(
     customer_name: str,
     customer_phone: str,
@@ -15,80 +106,69 @@ async def create_booking(
     customer_email: Optional[str] = None,
     guest_count: Optional[int] = None,
     package_type: Optional[str] = None,
-    special_requests: Optional[str] = None
+    special_requests: Optional[str] = None,
+    slot: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Create a new booking.
-    Returns the created booking with its ID.
+    Create a new booking in `slot`, or the first slot of the day with room.
+    Returns the created booking with its ID, or an error if the slot (or
+    without one, the date) is full. Capacity is checked and the row inserted
+    under a per-date advisory lock, so concurrent requests for the last
+    place cannot both succeed.
     """
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
     
+    phone_e164 = normalize_phone(customer_phone)
+    if not phone_e164:
+        return {"success": False, "error": "Invalid phone number"}
+    
     try:
-        async with get_connection() as conn:
-            result = await conn.fetchrow('''
-                INSERT INTO bookings 
-                (customer_name, customer_phone, customer_email, event_type, 
-                 event_date, guest_count, package_type, special_requests, status)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, 'pending')
-                RETURNING id, customer_name, customer_phone, event_type, 
-                          event_date, guest_count, status, created_at
-            ''', customer_name, customer_phone, customer_email, event_type,
-                event_date, guest_count, package_type, special_requests)
+        slot_id = parse_slot(slot)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    
+    try:
+        async with get_connection(track_write=True) as conn:
+            async with conn.transaction():
+                await fetchval(conn, "booking_lock_date", event_date)
+                result = await fetchrow(
+                    conn, "booking_insert",
+                    customer_name, customer_phone, customer_email, event_type,
+                    event_date, guest_count, package_type, special_requests,
+                    slot_id, phone_e164
+                )
             
-            return {
-                "success": True,
-                "booking": {
-                    "id": result["id"],
-                    "customer_name": result["customer_name"],
-                    "customer_phone": result["customer_phone"],
-                    "event_type": result["event_type"],
-                    "event_date": result["event_date"].isoformat(),
-                    "guest_count": result["guest_count"],
-                    "status": result["status"],
-                    "created_at": result["created_at"].isoformat()
-                }
-            }
+            if not result:
+                error = SLOT_FULLY_BOOKED_MESSAGE if slot_id else FULLY_BOOKED_MESSAGE
+                return {"success": False, "error": error}
+            record_change(None, None, None, result["event_date"], result["status"], result["slot_id"])
+            
+            return {"success": True, "booking": serialize_booking(result)}
     except Exception as e:
         print(f"Create booking error: {e}")
         return {"success": False, "error": str(e)}
 
 
+@traced("booking.get_booking_by_phone")
 async def get_booking_by_phone(phone: str) -> Dict[str, Any]:
     """
     Retrieve bookings by customer phone number.
-    Returns list of bookings for this phone number.
+    Returns list of bookings for this phone number, in whatever format it
+    was entered, matched on the normalized E.164 number.
     """
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
     
+    phone_e164 = normalize_phone(phone)
+    if not phone_e164:
+        return {"success": False, "error": "Invalid phone number"}
+    
     try:
-        async with get_connection() as conn:
-            results = await conn.fetch('''
-                SELECT id, customer_name, customer_phone, customer_email,
-                       event_type, event_date, guest_count, package_type,
-                       special_requests, status, created_at
-                FROM bookings
-                WHERE customer_phone = $1
-                ORDER BY event_date DESC
-            ''', phone)
+        async with get_connection(readonly=True) as conn:
+            results = await fetch(conn, "bookings_by_phone", phone_e164)
             
-            bookings = [
-                {
-                    "id": row["id"],
-                    "customer_name": row["customer_name"],
-                    "customer_phone": row["customer_phone"],
-                    "customer_email": row["customer_email"],
-                    "event_type": row["event_type"],
-                    "event_date": row["event_date"].isoformat(),
-                    "guest_count": row["guest_count"],
-                    "package_type": row["package_type"],
-                    "special_requests": row["special_requests"],
-                    "status": row["status"],
-                    "created_at": row["created_at"].isoformat()
-                }
-                for row in results
-            ]
+            bookings = serialize_bookings(results)
             
             return {"success": True, "bookings": bookings}
     except Exception as e:
@@ -96,235 +176,672 @@ async def get_booking_by_phone(phone: str) -> Dict[str, Any]:
         return {"success": False, "error": str(e)}
 
 
+async def backfill_phone_numbers() -> Dict[str, Any]:
+    """
+    Fill in customer_phone_e164 for bookings stored before phone numbers
+    were normalized. Rows whose number cannot be parsed are left empty.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    try:
+        async with get_connection() as conn:
+            rows = await conn.fetch(
+                "SELECT id, customer_phone FROM bookings WHERE customer_phone_e164 IS NULL"
+            )
+            ids, numbers = [], []
+            for row in rows:
+                number = normalize_phone(row["customer_phone"])
+                if number:
+                    ids.append(row["id"])
+                    numbers.append(number)
+            if ids:
+                await conn.execute('''
+                    UPDATE bookings b
+                    SET customer_phone_e164 = n.number
+                    FROM unnest($1::integer[], $2::varchar[]) AS n(id, number)
+                    WHERE b.id = n.id
+                ''', ids, numbers)
+
+        return {"success": True, "updated": len(ids), "unparsed": len(rows) - len(ids)}
+    except Exception as e:
+        print(f"Backfill phone numbers error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@traced("booking.get_booking_by_id")
 async def get_booking_by_id(booking_id: int) -> Dict[str, Any]:
     """Retrieve a specific booking by ID."""
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
     
     try:
-        async with get_connection() as conn:
-            row = await conn.fetchrow('''
-                SELECT id, customer_name, customer_phone, customer_email,
-                       event_type, event_date, guest_count, package_type,
-                       special_requests, status, created_at
-                FROM bookings
-                WHERE id = $1
-            ''', booking_id)
+        async with get_connection(readonly=True) as conn:
+            row = await fetchrow(conn, "booking_by_id", booking_id)
             
             if not row:
                 return {"success": False, "error": "Booking not found"}
             
-            return {
-                "success": True,
-                "booking": {
-                    "id": row["id"],
-                    "customer_name": row["customer_name"],
-                    "customer_phone": row["customer_phone"],
-                    "customer_email": row["customer_email"],
-                    "event_type": row["event_type"],
-                    "event_date": row["event_date"].isoformat(),
-                    "guest_count": row["guest_count"],
-                    "package_type": row["package_type"],
-                    "special_requests": row["special_requests"],
-                    "status": row["status"],
-                    "created_at": row["created_at"].isoformat()
-                }
-            }
+            return {"success": True, "booking": serialize_booking(row)}
     except Exception as e:
         print(f"Get booking by ID error: {e}")
         return {"success": False, "error": str(e)}
 
 
+@traced("booking.update_booking")
 async def update_booking(
     booking_id: int,
     event_date: Optional[date] = None,
     guest_count: Optional[int] = None,
     special_requests: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    expected_version: Optional[int] = None,
+    slot: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Update an existing booking.
-    Only provided fields will be updated.
+    Only provided fields will be updated. Moving a booking to another date
+    or slot, or reactivating it, is subject to the same capacity check as
+    creation; without a slot it keeps its own if that has room.
+    With expected_version, the update only applies if the booking is still
+    at that version; a stale version fails before any lock is taken.
     """
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
     
-    # Build dynamic update query
-    updates = []
-    values = []
-    param_count = 1
-    
-    if event_date is not None:
-        updates.append(f"event_date = ${param_count}")
-        values.append(event_date)
-        param_count += 1
-    
-    if guest_count is not None:
-        updates.append(f"guest_count = ${param_count}")
-        values.append(guest_count)
-        param_count += 1
-    
-    if special_requests is not None:
-        updates.append(f"special_requests = ${param_count}")
-        values.append(special_requests)
-        param_count += 1
-    
-    if status is not None:
-        updates.append(f"status = ${param_count}")
-        values.append(status)
-        param_count += 1
-    
-    if not updates:
+    if all(v is None for v in (event_date, guest_count, special_requests, status, slot)):
         return {"success": False, "error": "No fields to update"}
     
-    updates.append(f"updated_at = ${param_count}")
-    values.append(datetime.now())
-    param_count += 1
+    try:
+        slot_id = parse_slot(slot)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     
-    values.append(booking_id)
+    needs_capacity = event_date is not None or slot_id is not None or (
+        status is not None and status not in INACTIVE_STATUSES
+    )
     
     try:
-        async with get_connection() as conn:
-            query = f'''
-                UPDATE bookings 
-                SET {", ".join(updates)}
-                WHERE id = ${param_count}
-                RETURNING id, customer_name, event_type, event_date, 
-                          guest_count, status, updated_at
-            '''
-            result = await conn.fetchrow(query, *values)
-            
-            if not result:
-                return {"success": False, "error": "Booking not found"}
+        async with get_connection(track_write=True) as conn:
+            # The date lock is taken before the row lock (as in
+            # bulk_update_bookings), so if the booking moves to another date
+            # before its row is locked, start over locking that date.
+            locked_date = None
+            while True:
+                async with conn.transaction():
+                    if needs_capacity or expected_version is not None:
+                        current = await fetchrow(conn, "booking_event_date", booking_id)
+                        if not current:
+                            return {"success": False, "error": "Booking not found"}
+                        if expected_version is not None and current["version"] != expected_version:
+                            return {"success": False, "error": VERSION_CONFLICT_MESSAGE}
+                    if needs_capacity:
+                        locked_date = event_date or locked_date or current["event_date"]
+                        await fetchval(conn, "booking_lock_date", locked_date)
+                        locked = await fetchrow(conn, "booking_for_update", booking_id)
+                        if not locked:
+                            return {"success": False, "error": "Booking not found"}
+                        if event_date is None and locked["event_date"] != locked_date:
+                            locked_date = locked["event_date"]
+                            continue
+                    
+                    result = await fetchrow(
+                        conn, "booking_update",
+                        booking_id, event_date, guest_count, special_requests, status,
+                        slot_id, expected_version
+                    )
+                    
+                    if not result:
+                        exists = await fetchrow(conn, "booking_event_date", booking_id)
+                        if not exists:
+                            error = "Booking not found"
+                        elif expected_version is not None and exists["version"] != expected_version:
+                            error = VERSION_CONFLICT_MESSAGE
+                        else:
+                            error = SLOT_FULLY_BOOKED_MESSAGE if slot_id else FULLY_BOOKED_MESSAGE
+                        return {"success": False, "error": error}
+                break
+            record_change(
+                result["previous_event_date"], result["previous_status"], result["previous_slot_id"],
+                result["event_date"], result["status"], result["slot_id"]
+            )
             
-            return {
-                "success": True,
-                "booking": {
-                    "id": result["id"],
-                    "customer_name": result["customer_name"],
-                    "event_type": result["event_type"],
-                    "event_date": result["event_date"].isoformat(),
-                    "guest_count": result["guest_count"],
-                    "status": result["status"],
-                    "updated_at": result["updated_at"].isoformat()
-                }
-            }
+            return {"success": True, "booking": serialize_booking(result)}
     except Exception as e:
         print(f"Update booking error: {e}")
         return {"success": False, "error": str(e)}
 
 
-async def check_availability(check_date: date) -> Dict[str, Any]:
+async def _booked_on(day: date) -> Dict[int, int]:
+    """Active bookings per slot on a date, from memory when it covers the date."""
+    booked = availability.get(day)
+    cache_lookup("availability_calendar", hits=int(booked is not None), misses=int(booked is None))
+    if booked is None:
+        async with get_connection(readonly=True) as conn:
+            rows = await fetch(conn, "slot_bookings_for_dates", [day])
+        booked = {row["slot_id"]: row["booked"] for row in rows}
+    return booked
+
+
+@traced("booking.check_availability")
+async def check_availability(check_date: date, slot: Optional[str] = None) -> Dict[str, Any]:
     """
-    Check if a date is available for booking.
-    Returns availability status and existing bookings count.
+    Check if a date, or one slot on it, is available for booking.
+    Returns availability per slot and the totals across them, answered
+    from the in-memory calendar when it covers the date and otherwise with
+    one primary key lookup.
     """
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
     
     try:
-        async with get_connection() as conn:
-            # Count confirmed bookings on this date
-            count = await conn.fetchval('''
-                SELECT COUNT(*) FROM bookings
-                WHERE event_date = $1 
-                AND status NOT IN ('cancelled', 'rejected')
-            ''', check_date)
-            
-            # Assuming max 2 events per day (morning/evening)
-            MAX_EVENTS_PER_DAY = 2
-            is_available = count < MAX_EVENTS_PER_DAY
-            
-            return {
-                "success": True,
-                "date": check_date.isoformat(),
-                "available": is_available,
-                "existing_bookings": count,
-                "max_bookings": MAX_EVENTS_PER_DAY,
-                "message": "Date is available!" if is_available else "This date is fully booked. Please try another date."
-            }
+        slot_id = parse_slot(slot)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    
+    try:
+        booked = await _booked_on(check_date)
+        capacities = slots.capacities(slot_id)
+        is_available = availability.free_places(booked, capacities) > 0
+        
+        result = {
+            "success": True,
+            "date": check_date.isoformat(),
+            "available": is_available,
+            "existing_bookings": sum(booked.get(i, 0) for i in capacities),
+            "max_bookings": sum(capacities.values()),
+            "slots": [
+                {
+                    **slots.describe(s),
+                    "booked": booked.get(s["id"], 0),
+                    "available": booked.get(s["id"], 0) < s["capacity"]
+                }
+                for s in slots.active() if s["id"] in capacities
+            ],
+            "message": "Date is available!" if is_available else (
+                SLOT_FULLY_BOOKED_MESSAGE if slot_id else FULLY_BOOKED_MESSAGE
+            )
+        }
+        
+        # Offer alternatives up front so a full date needs no further probing
+        if not is_available:
+            suggestions = await find_available_dates(check_date, count=3, slot=slot)
+            if suggestions["success"]:
+                result["suggested_dates"] = [d["date"] for d in suggestions["dates"]]
+        
+        return result
     except Exception as e:
         print(f"Check availability error: {e}")
         return {"success": False, "error": str(e)}
 
 
+async def _month_counts(start: date, end: date) -> Dict[date, Dict[int, int]]:
+    """
+    Active bookings per slot from start to end, cached per month.
+    Uncached months are loaded with one range query.
+    """
+    # Months overlapping the range, in order
+    months = []
+    cursor = start.replace(day=1)
+    while cursor <= end:
+        months.append((cursor.year, cursor.month))
+        cursor = (cursor + timedelta(days=32)).replace(day=1)
+
+    now = time.monotonic()
+    missing = [
+        m for m in months
+        if m not in _month_cache or now - _month_cache[m][0] > AVAILABILITY_CACHE_TTL
+    ]
+    cache_lookup("availability_month", hits=len(months) - len(missing), misses=len(missing))
+
+    if missing:
+        first = date(missing[0][0], missing[0][1], 1)
+        last_start = date(missing[-1][0], missing[-1][1], 1)
+        last = (last_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+        async with get_connection(readonly=True) as conn:
+            rows = await fetch(conn, "slot_bookings_in_range", first, last)
+
+        loaded = {m: {} for m in missing}
+        for row in rows:
+            key = (row["event_date"].year, row["event_date"].month)
+            if key in loaded:
+                loaded[key].setdefault(row["event_date"], {})[row["slot_id"]] = row["booked"]
+        for key, counts in loaded.items():
+            _month_cache[key] = (now, counts)
+
+    counts = {}
+    for month in months:
+        counts.update(_month_cache[month][1])
+    return counts
+
+
+@traced("booking.get_availability_range")
+async def get_availability_range(start: date, end: date, slot: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Check availability for every date from start to end inclusive, across
+    all slots or only `slot`. Served from the in-memory calendar when it
+    covers the range, otherwise from per-month cached counts.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    if end < start:
+        return {"success": False, "error": "Invalid range: 'to' is before 'from'"}
+    if (end - start).days + 1 > AVAILABILITY_MAX_RANGE_DAYS:
+        return {"success": False, "error": f"Invalid range: at most {AVAILABILITY_MAX_RANGE_DAYS} days"}
+
+    try:
+        slot_id = parse_slot(slot)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    try:
+        covered = availability.covers(start, end)
+        cache_lookup("availability_calendar", hits=int(covered), misses=int(not covered))
+        if covered:
+            booked_on = availability.get
+        else:
+            counts = await _month_counts(start, end)
+            booked_on = lambda day: counts.get(day, {})
+
+        capacities = slots.capacities(slot_id)
+        codes = {s["id"]: slots.code(s) for s in slots.active()}
+        dates = []
+        day = start
+        while day <= end:
+            booked = booked_on(day)
+            free = availability.free_places(booked, capacities)
+            dates.append({
+                "date": day.isoformat(),
+                "existing_bookings": sum(booked.get(i, 0) for i in capacities),
+                "free_slots": free,
+                "available": free > 0,
+                "open_slots": [
+                    codes[i] for i, capacity in capacities.items() if booked.get(i, 0) < capacity
+                ]
+            })
+            day += timedelta(days=1)
+
+        return {
+            "success": True,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "max_bookings": sum(capacities.values()),
+            "dates": dates
+        }
+    except Exception as e:
+        print(f"Availability range error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+def parse_weekdays(values: Optional[List[str]]) -> Optional[List[int]]:
+    """
+    Convert weekday names ("fri", "Saturday") or ISO numbers ("5") to ISO
+    weekday numbers. Raises ValueError for anything else.
+    """
+    if not values:
+        return None
+    weekdays = []
+    for value in values:
+        value = str(value).strip().lower()
+        if value.isdigit() and 1 <= int(value) <= 7:
+            weekdays.append(int(value))
+            continue
+        matches = [n for name, n in WEEKDAYS.items() if len(value) >= 3 and name.startswith(value)]
+        if len(matches) != 1:
+            raise ValueError(f"Invalid weekday: {value}")
+        weekdays.append(matches[0])
+    return sorted(set(weekdays))
+
+
+@traced("booking.find_available_dates")
+async def find_available_dates(
+    after: date,
+    count: int = 5,
+    weekdays: Optional[List[int]] = None,
+    slot: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Find the next dates after `after` that still have room in any slot, or
+    in `slot`, optionally only on the given ISO weekdays. Answered from the
+    in-memory calendar when it covers the search, otherwise with one
+    generate_series query.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    try:
+        slot_id = parse_slot(slot)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    try:
+        capacities = slots.capacities(slot_id)
+        found = availability.find_free(
+            after, count, capacities, weekdays, AVAILABLE_DATES_HORIZON_DAYS
+        )
+        cache_lookup("availability_calendar", hits=int(found is not None), misses=int(found is None))
+        if found is None:
+            async with get_connection(readonly=True) as conn:
+                rows = await fetch(
+                    conn, "available_dates_after",
+                    after, AVAILABLE_DATES_HORIZON_DAYS, weekdays,
+                    [slot_id] if slot_id else None, count
+                )
+            found = [(row["event_date"], row["booked"], row["free"]) for row in rows]
+        else:
+            found = [
+                (day, sum(booked.get(i, 0) for i in capacities), availability.free_places(booked, capacities))
+                for day, booked in found
+            ]
+
+        return {
+            "success": True,
+            "after": after.isoformat(),
+            "max_bookings": sum(capacities.values()),
+            "dates": [
+                {
+                    "date": day.isoformat(),
+                    "weekday": day.strftime("%A"),
+                    "existing_bookings": booked,
+                    "free_slots": free
+                }
+                for day, booked, free in found
+            ]
+        }
+    except Exception as e:
+        print(f"Find available dates error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@traced("booking.cancel_booking")
 async def cancel_booking(booking_id: int) -> Dict[str, Any]:
     """Cancel a booking by setting its status to 'cancelled'."""
     return await update_booking(booking_id, status="cancelled")
 
 
+async def _apply_bulk_update(
+    conn, ids, current, needs_capacity,
+    event_date, guest_count, special_requests, status
+):
+    """
+    Check capacity for the locked rows of a bulk update and apply it to the
+    bookings that fit, each keeping its slot if it has room on the new date
+    and otherwise taking the first slot with room. Returns (changed rows,
+    previous rows by id, not found ids, fully booked ids).
+    """
+    previous = {row["id"]: row for row in current}
+    not_found = [i for i in ids if i not in previous]
+    fully_booked = []
+    accepted = list(previous)
+    slot_ids = {row["id"]: row["slot_id"] for row in current}
+
+    if needs_capacity:
+        targets = sorted({event_date or row["event_date"] for row in current})
+        booked = {day: {} for day in targets}
+        for row in await fetch(conn, "slot_bookings_for_dates", targets):
+            booked[row["event_date"]][row["slot_id"]] = row["booked"]
+        accepted = []
+        for row in current:
+            new_date = event_date or row["event_date"]
+            new_status = status or row["status"]
+            occupies = (
+                row["status"] not in INACTIVE_STATUSES
+                and row["event_date"] == new_date
+                and row["slot_id"] is not None
+            )
+            if new_status in INACTIVE_STATUSES or occupies:
+                accepted.append(row["id"])
+                continue
+            slot_id = slots.first_free(booked[new_date], row["slot_id"])
+            if slot_id is None:
+                fully_booked.append(row["id"])
+                continue
+            booked[new_date][slot_id] = booked[new_date].get(slot_id, 0) + 1
+            slot_ids[row["id"]] = slot_id
+            accepted.append(row["id"])
+
+    changed = []
+    if accepted:
+        changed = await fetch(
+            conn, "bookings_bulk_update",
+            accepted, event_date, guest_count, special_requests, status,
+            [slot_ids[i] for i in accepted]
+        )
+    return changed, previous, not_found, fully_booked
+
+
+@traced("booking.bulk_update_bookings")
+async def bulk_update_bookings(
+    booking_ids: List[int],
+    event_date: Optional[date] = None,
+    guest_count: Optional[int] = None,
+    special_requests: Optional[str] = None,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Apply the same update to many bookings in one transaction and one UPDATE.
+    Returns only the bookings that changed, plus the ids that were not found
+    or would have overbooked a date (those are left untouched).
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    if all(v is None for v in (event_date, guest_count, special_requests, status)):
+        return {"success": False, "error": "No fields to update"}
+
+    ids = sorted(set(booking_ids))
+    needs_capacity = event_date is not None or (
+        status is not None and status not in INACTIVE_STATUSES
+    )
+
+    try:
+        async with get_connection(track_write=True) as conn:
+            # Dates to lock. Date locks are always taken before row locks
+            # (as in update_booking), so if a booking moves to another date
+            # before its row is locked, start over with that date included.
+            wanted = {event_date} if event_date is not None else set()
+            if needs_capacity and event_date is None:
+                rows = await fetch(conn, "bookings_event_dates", ids)
+                wanted = {row["event_date"] for row in rows}
+
+            while True:
+                async with conn.transaction():
+                    if needs_capacity:
+                        for day in sorted(wanted):
+                            await fetchval(conn, "booking_lock_date", day)
+                    current = await fetch(conn, "bookings_for_update", ids)
+                    moved = {row["event_date"] for row in current} - wanted
+                    if not needs_capacity or event_date is not None or not moved:
+                        changed, previous, not_found, fully_booked = await _apply_bulk_update(
+                            conn, ids, current, needs_capacity,
+                            event_date, guest_count, special_requests, status
+                        )
+                        break
+                wanted |= moved
+
+        for row in changed:
+            before = previous[row["id"]]
+            record_change(
+                before["event_date"], before["status"], before["slot_id"],
+                row["event_date"], row["status"], row["slot_id"]
+            )
+
+        return {
+            "success": True,
+            "bookings": serialize_bookings(changed),
+            "not_found": not_found,
+            "fully_booked": fully_booked
+        }
+    except Exception as e:
+        print(f"Bulk update bookings error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+def encode_cursor(event_date: date, booking_id: int) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    raw = f"{event_date.isoformat()}:{booking_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        event_date, booking_id = base64.urlsafe_b64decode(padded).decode().split(":")
+        return date.fromisoformat(event_date), int(booking_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _like_pattern(text: str) -> str:
+    """Escape text for use as an ILIKE substring pattern."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+@traced("booking.get_all_bookings")
 async def get_all_bookings(
     status_filter: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    search: Optional[str] = None,
+    known_revision: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Retrieve all bookings with optional filtering.
-    Returns paginated list of bookings.
+    Returns a page of bookings ordered by (event_date, id) descending, with
+    a next_cursor for the following page. The total is optional and comes
+    back in the same query.
+    With `search`, bookings whose name, phone, email or special requests
+    match it are ranked by trigram similarity instead and paged by offset.
+    Every result carries the table's current `revision`. If it equals
+    `known_revision`, nothing has changed and the page is not queried;
+    the result then has `not_modified` set instead of bookings.
     """
     if not is_configured():
         return {"success": False, "error": "Database not configured"}
 
+    if search:
+        if cursor:
+            return {"success": False, "error": "Invalid cursor: search results are paged by offset"}
+        if not has_extension("pg_trgm"):
+            return {"success": False, "error": "Search is not available (pg_trgm extension missing)"}
+
     try:
-        async with get_connection() as conn:
-            # Build query with optional status filter
-            query = '''
-                SELECT id, customer_name, customer_phone, customer_email,
-                       event_type, event_date, guest_count, package_type,
-                       special_requests, status, created_at, updated_at
-                FROM bookings
-            '''
-            params = []
-
-            if status_filter:
-                query += " WHERE status = $1"
-                params.append(status_filter)
-                query += " ORDER BY event_date DESC LIMIT $2 OFFSET $3"
-                params.extend([limit, offset])
-            else:
-                query += " ORDER BY event_date DESC LIMIT $1 OFFSET $2"
-                params.extend([limit, offset])
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
 
-            results = await conn.fetch(query, *params)
+    try:
+        async with get_connection(readonly=True) as conn:
+            # Read the revision before the page, so the page is never older
+            # than the revision it is labelled with
+            revision = await fetchval(conn, "bookings_revision")
+            if known_revision is not None and revision == known_revision:
+                return {"success": True, "not_modified": True, "revision": revision}
 
-            # Get total count
-            count_query = "SELECT COUNT(*) FROM bookings"
-            if status_filter:
-                count_query += " WHERE status = $1"
-                total = await conn.fetchval(count_query, status_filter)
+            # Fetch one extra row to know whether another page exists
+            if search:
+                results = await fetch(
+                    conn, "bookings_search",
+                    search, _like_pattern(search), status_filter,
+                    limit + 1, offset, include_total
+                )
+            elif status_filter and after:
+                results = await fetch(
+                    conn, "bookings_page_by_status_after",
+                    status_filter, limit + 1, *after, include_total
+                )
+            elif status_filter:
+                results = await fetch(
+                    conn, "bookings_page_by_status",
+                    status_filter, limit + 1, offset, include_total
+                )
+            elif after:
+                results = await fetch(
+                    conn, "bookings_page_after", limit + 1, *after, include_total
+                )
             else:
-                total = await conn.fetchval(count_query)
+                results = await fetch(
+                    conn, "bookings_page", limit + 1, offset, include_total
+                )
 
-            bookings = [
-                {
-                    "id": row["id"],
-                    "customer_name": row["customer_name"],
-                    "customer_phone": row["customer_phone"],
-                    "customer_email": row["customer_email"],
-                    "event_type": row["event_type"],
-                    "event_date": row["event_date"].isoformat(),
-                    "guest_count": row["guest_count"],
-                    "package_type": row["package_type"],
-                    "special_requests": row["special_requests"],
-                    "status": row["status"],
-                    "created_at": row["created_at"].isoformat(),
-                    "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None
-                }
-                for row in results
-            ]
+            total = None
+            if include_total:
+                if results:
+                    total = results[0]["total"]
+                elif search:
+                    total = await fetchval(
+                        conn, "bookings_search_count",
+                        search, _like_pattern(search), status_filter
+                    )
+                elif status_filter:
+                    total = await fetchval(conn, "bookings_count_by_status", status_filter)
+                else:
+                    total = await fetchval(conn, "bookings_count")
+
+            next_cursor = None
+            if len(results) > limit:
+                results = results[:limit]
+                if not search:
+                    last = results[-1]
+                    next_cursor = encode_cursor(last["event_date"], last["id"])
+
+            bookings = serialize_bookings(results)
 
             return {
                 "success": True,
                 "bookings": bookings,
                 "total": total,
                 "limit": limit,
-                "offset": offset
+                "offset": offset,
+                "next_cursor": next_cursor,
+                "revision": revision
             }
     except Exception as e:
         print(f"Get all bookings error: {e}")
         return {"success": False, "error": str(e)}
 
 
+@traced("booking.get_booking_stats")
+async def get_booking_stats() -> Dict[str, Any]:
+    """
+    Booking counts by status, event type, month and guest-count bucket.
+    Read from the booking_stats summary table, which triggers keep current,
+    so the cost does not grow with booking history.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    try:
+        async with get_connection(readonly=True) as conn:
+            rows = await fetch(conn, "booking_stats")
+
+        stats = {"status": {}, "event_type": {}, "month": {}, "guest_count": {}}
+        for row in rows:
+            stats[row["dimension"]][row["key"]] = row["count"]
+
+        return {
+            "success": True,
+            "total": sum(stats["status"].values()),
+            "by_status": stats["status"],
+            "by_event_type": dict(sorted(stats["event_type"].items(), key=lambda item: -item[1])),
+            "by_month": dict(sorted(stats["month"].items())),
+            "by_guest_count": {
+                bucket: stats["guest_count"][bucket]
+                for bucket in GUEST_COUNT_BUCKETS if bucket in stats["guest_count"]
+            }
+        }
+    except Exception as e:
+        print(f"Booking stats error: {e}")
+        return {"success": False, "error": str(e)}
+
+
+@traced("booking.delete_booking")
 async def delete_booking(booking_id: int) -> Dict[str, Any]:
     """
     Delete a booking permanently.
@@ -334,13 +851,12 @@ async def delete_booking(booking_id: int) -> Dict[str, Any]:
         return {"success": False, "error": "Database not configured"}
 
     try:
-        async with get_connection() as conn:
-            result = await conn.execute('''
-                DELETE FROM bookings WHERE id = $1
-            ''', booking_id)
+        async with get_connection(track_write=True) as conn:
+            deleted = await fetchrow(conn, "booking_delete", booking_id)
 
-            if result == "DELETE 0":
+            if not deleted:
                 return {"success": False, "error": "Booking not found"}
+            record_change(deleted["event_date"], deleted["status"], deleted["slot_id"], None, None, None)
 
             return {"success": True, "message": "Booking deleted successfully"}
     except Exception as e:
@@ -0,0 +1,87 @@
+"""
+Booking Archive
+Moves year partitions of past events out of bookings, so old events stop
+weighing on its indexes and queries
+"""
+from datetime import date
+from typing import Dict, Any
+from database import get_connection, is_configured, bookings_partitioned, booking_partitions
+
+ARCHIVE_SCHEMA = "booking_archive"
+
+
+async def _archive_partition(conn, name: str) -> int:
+    """
+    Detach one partition into the archive schema, keeping stats and feed in
+    step. Returns the number of bookings archived.
+    """
+    async with conn.transaction():
+        # Blocks booking writes for the moment it takes, so the stats and
+        # slot occupancy corrections and the detach see exactly the same rows
+        await conn.execute("LOCK TABLE bookings IN ACCESS EXCLUSIVE MODE")
+        await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        count = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+        await conn.execute(f'''
+            UPDATE booking_stats s
+            SET count = s.count - k.count
+            FROM (
+                SELECT k.dimension, k.key, COUNT(*) AS count
+                FROM {name} b
+                CROSS JOIN LATERAL booking_stat_keys(b.status, b.event_type, b.event_date, b.guest_count) k
+                GROUP BY k.dimension, k.key
+            ) k
+            WHERE s.dimension = k.dimension AND s.key = k.key
+        ''')
+        await conn.execute(f'''
+            DELETE FROM slot_bookings s
+            USING (SELECT DISTINCT event_date FROM {name}) d
+            WHERE s.event_date = d.event_date
+        ''')
+        await conn.execute(f"ALTER TABLE bookings DETACH PARTITION {name}")
+        await conn.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+
+        if not count:
+            return 0
+        # Tell change feed clients to reload, as the triggers would for a truncate
+        revision = await conn.fetchval(
+            "UPDATE booking_revision SET revision = revision + 1 RETURNING revision"
+        )
+        await conn.execute(
+            "INSERT INTO booking_changes (revision, operation) VALUES ($1, 'archive')", revision
+        )
+        await conn.execute("SELECT pg_notify('booking_changes', $1)", str(revision))
+    return count
+
+
+async def archive_bookings(before_year: int, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Archive the partitions of every year before `before_year`.
+    Each is detached from bookings into the booking_archive schema, where
+    it can be dumped and dropped. Archived bookings no longer appear in the
+    API or the stats.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    if before_year > date.today().year:
+        return {"success": False, "error": "Invalid year: only past years can be archived"}
+
+    try:
+        archived = []
+        async with get_connection() as conn:
+            if not await bookings_partitioned(conn):
+                return {"success": False, "error": "bookings is not partitioned; run scripts/partition_bookings.py"}
+
+            partitions = await booking_partitions(conn)
+            for year in sorted(y for y in partitions if y < before_year):
+                name = partitions[year]
+                if dry_run:
+                    count = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+                else:
+                    count = await _archive_partition(conn, name)
+                archived.append({"year": year, "table": f"{ARCHIVE_SCHEMA}.{name}", "bookings": count})
+
+        return {"success": True, "dry_run": dry_run, "archived": archived}
+    except Exception as e:
+        print(f"Archive bookings error: {e}")
+        return {"success": False, "error": str(e)}
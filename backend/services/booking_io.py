@@ -0,0 +1,262 @@
+"""
+Booking Export and Import
+Streams bookings out with COPY and loads spreadsheets in with COPY
+"""
+import asyncio
+import csv
+import io
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+from database import get_connection, is_configured, fetch, fetchval
+from services import slots
+from services.booking import record_change
+from services.phone import normalize_phone
+from statements import INACTIVE_STATUSES
+
+EXPORT_COLUMNS = [
+    "id", "customer_name", "customer_phone", "customer_email",
+    "event_type", "event_date", "guest_count", "package_type",
+    "special_requests", "status", "created_at", "updated_at", "slot",
+]
+
+IMPORT_COLUMNS = [
+    "customer_name", "customer_phone", "customer_email", "event_type",
+    "event_date", "guest_count", "package_type", "special_requests", "status",
+    "slot",
+]
+REQUIRED_IMPORT_COLUMNS = ["customer_name", "customer_phone", "event_type", "event_date"]
+
+# Columns written by COPY: the import columns, with the normalized phone
+# and the slot's id in place of its code
+COPY_COLUMNS = IMPORT_COLUMNS[:-1] + ["customer_phone_e164", "slot_id"]
+
+STATUSES = ("pending", "confirmed", "cancelled", "rejected")
+
+# Column limits from the bookings table
+_MAX_LENGTHS = {
+    "customer_name": 255,
+    "customer_phone": 20,
+    "customer_email": 255,
+    "event_type": 100,
+    "package_type": 100,
+}
+
+_EXPORT_QUERY = f'''
+    SELECT {", ".join(EXPORT_COLUMNS[:-1])},
+           (SELECT resource || '-' || name FROM slots WHERE slots.id = slot_id) AS slot
+    FROM bookings
+    WHERE ($1::varchar IS NULL OR status = $1)
+    AND ($2::date IS NULL OR event_date >= $2)
+    AND ($3::date IS NULL OR event_date <= $3)
+    ORDER BY event_date, id
+'''
+
+# Chunks buffered between COPY and the HTTP response
+_EXPORT_BUFFER_CHUNKS = 16
+
+
+async def export_bookings(
+    fmt: str = "csv",
+    status_filter: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None
+) -> AsyncIterator[bytes]:
+    """
+    Stream bookings as CSV (with header) or NDJSON, chunk by chunk, straight
+    from COPY ... TO STDOUT. Nothing is materialized in Python.
+    """
+    if fmt == "ndjson":
+        # One JSON document per line. CSV mode with control characters as
+        # quote and delimiter passes row_to_json output through unescaped.
+        query = f"SELECT row_to_json(b) FROM ({_EXPORT_QUERY}) b"
+        options = {"format": "csv", "delimiter": "\x02", "quote": "\x01"}
+    else:
+        query = _EXPORT_QUERY
+        options = {"format": "csv", "header": True}
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_EXPORT_BUFFER_CHUNKS)
+
+    async def put(data):
+        # COPY hands over a reusable buffer; keep an immutable copy
+        await queue.put(bytes(data))
+
+    async def copy_out():
+        try:
+            async with get_connection(readonly=True) as conn:
+                await conn.copy_from_query(
+                    query, status_filter, from_date, to_date,
+                    output=put, **options
+                )
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(copy_out())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                print(f"Export bookings error: {chunk}")
+                raise chunk
+            yield chunk
+    finally:
+        # The client may disconnect mid-stream; stop COPY and free the connection
+        task.cancel()
+
+
+def _parse_date(value: str) -> date:
+    """Accept YYYY-MM-DD or DD/MM/YYYY."""
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid event_date '{value}' (use YYYY-MM-DD)")
+
+
+def validate_import_row(row: Dict[str, str]) -> Tuple[Optional[tuple], Optional[str]]:
+    """
+    Validate one CSV row. Returns (record in COPY_COLUMNS order, None)
+    or (None, error message).
+    """
+    values = {k: (row.get(k) or "").strip() for k in IMPORT_COLUMNS}
+
+    for column in REQUIRED_IMPORT_COLUMNS:
+        if not values[column]:
+            return None, f"missing {column}"
+    for column, limit in _MAX_LENGTHS.items():
+        if len(values[column]) > limit:
+            return None, f"{column} longer than {limit} characters"
+
+    phone_e164 = normalize_phone(values["customer_phone"])
+    if not phone_e164:
+        return None, f"invalid customer_phone '{values['customer_phone']}'"
+
+    try:
+        event_date = _parse_date(values["event_date"])
+    except ValueError as e:
+        return None, str(e)
+
+    guest_count = None
+    if values["guest_count"]:
+        try:
+            guest_count = int(values["guest_count"])
+        except ValueError:
+            return None, f"invalid guest_count '{values['guest_count']}'"
+        if guest_count < 0:
+            return None, "guest_count cannot be negative"
+
+    status = (values["status"] or "pending").lower()
+    if status not in STATUSES:
+        return None, f"invalid status '{values['status']}'"
+
+    slot_id = None
+    if values["slot"]:
+        slot = slots.resolve(values["slot"])
+        if not slot:
+            return None, f"invalid slot '{values['slot']}'"
+        slot_id = slot["id"]
+
+    return (
+        values["customer_name"],
+        values["customer_phone"],
+        values["customer_email"] or None,
+        values["event_type"],
+        event_date,
+        guest_count,
+        values["package_type"] or None,
+        values["special_requests"] or None,
+        status,
+        phone_e164,
+        slot_id,
+    ), None
+
+
+async def import_bookings(csv_text: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Import bookings from CSV text with a header row.
+    Valid rows are loaded in one transaction with COPY; invalid rows, and
+    active rows that would push their slot over capacity, are reported with
+    their line number and skipped. Active rows without a slot take the
+    first one with room on their date.
+    """
+    if not is_configured():
+        return {"success": False, "error": "Database not configured"}
+
+    if not slots.active():
+        # Loaded at startup; load them here for scripts or if that failed
+        try:
+            await slots.load()
+        except Exception as e:
+            print(f"Import bookings error: {e}")
+            return {"success": False, "error": f"Could not load booking slots: {e}"}
+
+    reader = csv.DictReader(io.StringIO(csv_text.lstrip("\ufeff")))
+    missing = [c for c in REQUIRED_IMPORT_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        return {"success": False, "error": f"Invalid CSV: missing columns {', '.join(missing)}"}
+
+    records: List[Tuple[int, tuple]] = []
+    errors: List[Dict[str, Any]] = []
+    for row in reader:
+        record, error = validate_import_row(row)
+        if error:
+            errors.append({"line": reader.line_num, "error": error})
+        else:
+            records.append((reader.line_num, record))
+
+    active_dates = sorted({r[4] for _, r in records if r[8] not in INACTIVE_STATUSES})
+
+    try:
+        async with get_connection(track_write=True) as conn:
+            async with conn.transaction():
+                # Same per-date locks as create_booking, in a fixed order
+                for day in active_dates:
+                    await fetchval(conn, "booking_lock_date", day)
+                rows = await fetch(conn, "slot_bookings_for_dates", active_dates) if active_dates else []
+                booked = {day: {} for day in active_dates}
+                for row in rows:
+                    booked[row["event_date"]][row["slot_id"]] = row["booked"]
+                capacities = slots.capacities()
+
+                accepted = []
+                for line, record in records:
+                    if record[8] not in INACTIVE_STATUSES:
+                        day, slot_id = record[4], record[10]
+                        if slot_id is None:
+                            slot_id = slots.first_free(booked[day])
+                        elif booked[day].get(slot_id, 0) >= capacities.get(slot_id, 0):
+                            slot_id = None
+                        if slot_id is None:
+                            full = day.isoformat()
+                            if record[10] is not None:
+                                full += f" {slots.code(slots.get(record[10]))}"
+                            errors.append({"line": line, "error": f"{full} is fully booked"})
+                            continue
+                        booked[day][slot_id] = booked[day].get(slot_id, 0) + 1
+                        record = record[:10] + (slot_id,)
+                    accepted.append(record)
+
+                if accepted and not dry_run:
+                    await conn.copy_records_to_table(
+                        "bookings", records=accepted, columns=COPY_COLUMNS
+                    )
+
+        if not dry_run:
+            for record in accepted:
+                record_change(None, None, None, record[4], record[8], record[10])
+
+        errors.sort(key=lambda e: e["line"])
+        return {
+            "success": True,
+            "dry_run": dry_run,
+            "imported": 0 if dry_run else len(accepted),
+            "valid": len(accepted),
+            "rejected": len(errors),
+            "errors": errors
+        }
+    except Exception as e:
+        print(f"Import bookings error: {e}")
+        return {"success": False, "error": str(e)}
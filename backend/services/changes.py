@@ -0,0 +1,221 @@
+"""
+Booking Change Feed
+Inserts, updates and deletes of bookings, streamed live to dashboards.
+Database triggers log every change under a revision number and NOTIFY;
+one LISTEN connection per process reads each new revision once and fans
+it out to every subscriber. Subscribers resume from a revision by reading
+the log.
+"""
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+from config import CHANGE_FEED_RETENTION_HOURS, CHANGE_FEED_QUEUE_SIZE
+from database import get_connection, listen, fetch, fetchval, execute
+
+CHANNEL = "booking_changes"
+
+# Revisions read from the log per query when a subscriber catches up
+REPLAY_REVISIONS = 100
+
+# Queue item telling a subscriber it fell behind and must read the log
+_OVERFLOW = None
+# Queue item telling a subscriber the feed is shutting down
+_CLOSED = object()
+
+# Subscriber queues, and the last revision fanned out to them
+_subscribers = set()
+_revision: Optional[int] = None
+
+# Highest revision named by a notification, fetched by one task
+_notified = 0
+_fetch_task = None
+# Set when streams are ended for shutdown; later streams end at once
+_ended = False
+_prune_task = None
+
+
+def is_running() -> bool:
+    """Check if the feed is listening for changes."""
+    return _revision is not None
+
+
+def subscriber_count() -> int:
+    """Number of connected subscribers in this process."""
+    return len(_subscribers)
+
+
+def _events(rows: List) -> List[Dict]:
+    """
+    Group change rows into one event per revision. Each event's data is
+    encoded once here, however many subscribers it is sent to.
+    """
+    events = []
+    for row in rows:
+        if not events or events[-1]["revision"] != row["revision"]:
+            events.append({"revision": row["revision"], "changes": []})
+        events[-1]["changes"].append(row["change"])
+    for event in events:
+        changes = event.pop("changes")
+        event["data"] = f'{{"revision": {event["revision"]}, "changes": [{", ".join(changes)}]}}'
+    return events
+
+
+async def _read(after: int) -> List[Dict]:
+    """Events for up to REPLAY_REVISIONS revisions after `after`."""
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        rows = await fetch(conn, "booking_changes_after", after, REPLAY_REVISIONS)
+    return _events(rows)
+
+
+def _put(queue: asyncio.Queue, item):
+    """Queue an item; a full queue is emptied and told to read the log instead."""
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_CLOSED if item is _CLOSED else _OVERFLOW)
+
+
+async def _fetch_pending():
+    """Read every notified revision from the log and fan it out."""
+    global _fetch_task, _revision
+    try:
+        while _revision is not None and _revision < _notified:
+            events = await _read(_revision)
+            if not events:
+                # Revisions without logged changes
+                _revision = _notified
+                break
+            for event in events:
+                for queue in list(_subscribers):
+                    _put(queue, event)
+            _revision = events[-1]["revision"]
+    except Exception as e:
+        print(f"Change feed fetch error: {e}")
+    finally:
+        _fetch_task = None
+
+
+def _schedule_fetch():
+    """Start the fetch task if notified revisions have not been fanned out."""
+    global _fetch_task
+    if _fetch_task is None and _revision is not None and _notified > _revision:
+        _fetch_task = asyncio.get_running_loop().create_task(_fetch_pending())
+
+
+def _on_notify(payload: str):
+    """Schedule a log read for the revision named by a notification."""
+    global _notified
+    _notified = max(_notified, int(payload))
+    _schedule_fetch()
+
+
+async def current_revision() -> int:
+    """The latest committed revision."""
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        return await fetchval(conn, "bookings_revision")
+
+
+async def _catch_up():
+    """Fetch whatever changed while the LISTEN connection was down."""
+    _on_notify(str(await current_revision()))
+
+
+async def _is_resumable(after: int, current: int) -> bool:
+    """Whether every change after revision `after` is still in the log."""
+    if after >= current:
+        return after == current
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        oldest = await fetchval(conn, "booking_changes_oldest")
+    return oldest is not None and after >= oldest - 1
+
+
+async def stream(after: Optional[int] = None) -> AsyncIterator[Dict]:
+    """
+    Yield change events after revision `after`, then live ones as they are
+    committed. Each event is {"event", "revision", "data"} with event
+    "changes". Starts with a "ready" event carrying the current revision,
+    or "reset" if `after` is too old to resume from (reload everything).
+    """
+    current = await current_revision()
+    if after is None:
+        yield {"event": "ready", "revision": current, "data": f'{{"revision": {current}}}'}
+        after = current
+    elif not await _is_resumable(after, current):
+        yield {"event": "reset", "revision": current, "data": f'{{"revision": {current}}}'}
+        after = current
+
+    while not _ended:
+        queue = asyncio.Queue(CHANGE_FEED_QUEUE_SIZE)
+        _subscribers.add(queue)
+        try:
+            # Changes committed before subscribing come from the log, later
+            # ones from the queue; anything seen twice is skipped
+            while True:
+                events = await _read(after)
+                if not events:
+                    break
+                for event in events:
+                    yield {"event": "changes", **event}
+                    after = event["revision"]
+
+            while True:
+                event = await queue.get()
+                if event is _CLOSED:
+                    return
+                if event is _OVERFLOW:
+                    break
+                if event["revision"] > after:
+                    yield {"event": "changes", **event}
+                    after = event["revision"]
+        finally:
+            _subscribers.discard(queue)
+
+
+async def prune():
+    """Delete changes older than the retention period."""
+    async with get_connection() as conn:
+        await execute(conn, "booking_changes_prune", CHANGE_FEED_RETENTION_HOURS * 60 * 60)
+
+
+async def _prune_hourly():
+    """Keep the change log to the retention period."""
+    while True:
+        try:
+            await prune()
+        except Exception as e:
+            print(f"Change feed prune error: {e}")
+        await asyncio.sleep(60 * 60)
+
+
+async def start() -> bool:
+    """Subscribe to booking changes and start pruning the log."""
+    global _revision, _prune_task
+    try:
+        await listen(CHANNEL, _on_notify, on_reconnect=_catch_up)
+        _revision = await current_revision()
+        # Notifications that arrived while the revision was being read
+        _schedule_fetch()
+        _prune_task = asyncio.create_task(_prune_hourly())
+        return True
+    except Exception as e:
+        print(f"Change feed error: {e}")
+        return False
+
+
+def end_streams():
+    """End every open stream, and any opened from now on."""
+    global _ended
+    _ended = True
+    for queue in list(_subscribers):
+        _put(queue, _CLOSED)
+
+
+def stop():
+    """Stop pruning and end every open stream."""
+    global _revision, _prune_task
+    if _prune_task:
+        _prune_task.cancel()
+        _prune_task = None
+    end_streams()
+    _revision = None
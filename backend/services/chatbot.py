@@ -1,9 +1,9 @@
 """
 Chatbot Service with RAG and Booking Function Calling
 """
+import asyncio
 import json
 from datetime import datetime, date
-from openai import OpenAI
 from typing import List, Optional, Dict, Any
 from config import GEMINI_API_KEY, GEMINI_API_BASE_URL, MAX_CONVERSATION_HISTORY
 from models.schemas import ChatMessage
@@ -12,9 +12,11 @@ from models.schemas import ChatMessage
 from services.embeddings import search_knowledge, is_configured as embeddings_configured
 from services.booking import (
     create_booking, get_booking_by_phone, update_booking, 
-    check_availability, cancel_booking
+    check_availability, cancel_booking, find_available_dates, parse_weekdays
 )
 from database import is_configured as db_configured
+from metrics import ExternalCall
+from tracing import span, traced, set_attributes
 
 # System prompt with venue knowledge
 SYSTEM_PROMPT = """You are a friendly and helpful AI assistant for Star Crescent Marriage Lawn, a premier wedding and event venue located in Karachi, Pakistan. Your role is to assist visitors with booking inquiries, answer questions about our services, and help with booking management.
@@ -42,17 +44,19 @@ SYSTEM_PROMPT = """You are a friendly and helpful AI assistant for Star Crescent
 ## Booking Capabilities
 
 You can help customers with:
-1. **Create Bookings** - Collect customer name, phone, event type, date, and guest count
+1. **Create Bookings** - Collect customer name, phone, event type, date, time slot, and guest count
 2. **Check Bookings** - Look up bookings by phone number
-3. **Check Availability** - Check if a specific date is available
-4. **Modify Bookings** - Update date, guest count, or special requests
+3. **Check Availability** - Check if a specific date, or a time slot on it, is available (a full date comes back with suggested alternatives)
+4. **Find Available Dates** - Suggest the next free dates, optionally only on certain weekdays
+5. **Modify Bookings** - Update date, guest count, or special requests
 
 When a customer wants to book:
 1. Ask for their name
 2. Ask for their phone number
 3. Ask for the event type (wedding, reception, corporate, birthday, mehndi)
 4. Ask for the preferred date
-5. Ask for estimated guest count (optional)
+5. Ask whether they prefer the morning or evening slot (optional; otherwise the first free slot is taken)
+6. Ask for estimated guest count (optional)
 
 ## Behavior Guidelines
 
@@ -64,6 +68,9 @@ When a customer wants to book:
 
 Remember: You represent Star Crescent Marriage Lawn - help make every customer feel welcomed!"""
 
+# Returned when the model cannot be reached
+ERROR_RESPONSE = "I apologize, but I'm experiencing some technical difficulties. Please try again or contact us directly at +92 300 1609087 for immediate assistance."
+
 # Function definitions for Gemini
 BOOKING_FUNCTIONS = [
     {
@@ -98,6 +105,10 @@ BOOKING_FUNCTIONS = [
                     "special_requests": {
                         "type": "string",
                         "description": "Any special requests or notes"
+                    },
+                    "slot": {
+                        "type": "string",
+                        "description": "Time slot, e.g. 'morning' or 'evening'. Leave out to take the first free slot of the day."
                     }
                 },
                 "required": ["customer_name", "customer_phone", "event_type", "event_date"]
@@ -114,7 +125,7 @@ BOOKING_FUNCTIONS = [
                 "properties": {
                     "phone": {
                         "type": "string",
-                        "description": "Customer's phone number"
+                        "description": "Customer's phone number, in any format"
                     }
                 },
                 "required": ["phone"]
@@ -125,19 +136,55 @@ BOOKING_FUNCTIONS = [
         "type": "function",
         "function": {
             "name": "check_availability",
-            "description": "Check if a specific date is available for booking",
+            "description": "Check if a specific date is available for booking, slot by slot (e.g. is the lawn free Saturday evening)",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "date": {
                         "type": "string",
                         "description": "Date to check in YYYY-MM-DD format"
+                    },
+                    "slot": {
+                        "type": "string",
+                        "description": "Only check this time slot, e.g. 'morning' or 'evening'"
                     }
                 },
                 "required": ["date"]
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_available_dates",
+            "description": "Find the next dates that are still available for booking. Use this when a requested date is full or the customer is flexible.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "after": {
+                        "type": "string",
+                        "description": "Search dates after this date, in YYYY-MM-DD format (defaults to today)"
+                    },
+                    "count": {
+                        "type": "integer",
+                        "description": "How many dates to return (default 5)"
+                    },
+                    "weekdays": {
+                        "type": "array",
+                        "items": {
+                            "type": "string",
+                            "enum": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+                        },
+                        "description": "Only return dates on these weekdays"
+                    },
+                    "slot": {
+                        "type": "string",
+                        "description": "Only return dates with this time slot free, e.g. 'evening'"
+                    }
+                }
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -161,6 +208,10 @@ BOOKING_FUNCTIONS = [
                     "special_requests": {
                         "type": "string",
                         "description": "Updated special requests"
+                    },
+                    "new_slot": {
+                        "type": "string",
+                        "description": "New time slot, e.g. 'morning' or 'evening'"
                     }
                 },
                 "required": ["booking_id"]
@@ -198,7 +249,8 @@ async def execute_function(name: str, arguments: Dict[str, Any]) -> Dict[str, An
                 event_type=arguments["event_type"],
                 event_date=event_date,
                 guest_count=arguments.get("guest_count"),
-                special_requests=arguments.get("special_requests")
+                special_requests=arguments.get("special_requests"),
+                slot=arguments.get("slot")
             )
         
         elif name == "check_booking":
@@ -206,7 +258,22 @@ async def execute_function(name: str, arguments: Dict[str, Any]) -> Dict[str, An
         
         elif name == "check_availability":
             check_date = datetime.strptime(arguments["date"], "%Y-%m-%d").date()
-            return await check_availability(check_date)
+            return await check_availability(check_date, arguments.get("slot"))
+        
+        elif name == "find_available_dates":
+            after = date.today()
+            if arguments.get("after"):
+                after = datetime.strptime(arguments["after"], "%Y-%m-%d").date()
+            try:
+                count = int(arguments.get("count") or 5)
+            except (TypeError, ValueError):
+                count = 5
+            return await find_available_dates(
+                after=after,
+                count=max(1, min(count, 31)),
+                weekdays=parse_weekdays(arguments.get("weekdays")),
+                slot=arguments.get("slot")
+            )
         
         elif name == "modify_booking":
             new_date = None
@@ -216,7 +283,8 @@ async def execute_function(name: str, arguments: Dict[str, Any]) -> Dict[str, An
                 booking_id=arguments["booking_id"],
                 event_date=new_date,
                 guest_count=arguments.get("new_guest_count"),
-                special_requests=arguments.get("special_requests")
+                special_requests=arguments.get("special_requests"),
+                slot=arguments.get("new_slot")
             )
         
         elif name == "cancel_booking":
@@ -231,17 +299,40 @@ async def execute_function(name: str, arguments: Dict[str, Any]) -> Dict[str, An
 
 class ChatbotService:
     def __init__(self):
+        # Built on first use: importing the openai SDK takes about half a
+        # second, which would otherwise delay every cold start
         self.client = None
-        if GEMINI_API_KEY:
-            self.client = OpenAI(
+    
+    def is_configured(self) -> bool:
+        """Check if the chatbot is properly configured with API key."""
+        return GEMINI_API_KEY != ""
+    
+    def get_client(self):
+        """Get or create the Gemini (OpenAI-compatible) client."""
+        if self.client is None and GEMINI_API_KEY:
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(
                 api_key=GEMINI_API_KEY,
                 base_url=GEMINI_API_BASE_URL
             )
+        return self.client
     
-    def is_configured(self) -> bool:
-        """Check if the chatbot is properly configured with API key."""
-        return self.client is not None and GEMINI_API_KEY != ""
+    async def warm_up(self):
+        """Import the SDK and build the client off the event loop, before the first chat."""
+        if self.is_configured():
+            await asyncio.to_thread(self.get_client)
+    
+    async def complete(self, operation: str, **params):
+        """Ask Gemini for a chat completion, recording its latency and token usage."""
+        async with ExternalCall("gemini", operation) as call:
+            set_attributes(**{"gen_ai.request.model": params["model"]})
+            response = await self.get_client().chat.completions.create(**params)
+            if response.usage:
+                call.tokens("prompt", response.usage.prompt_tokens or 0)
+                call.tokens("completion", response.usage.completion_tokens or 0)
+            return response
     
+    @traced("chat.rag_context")
     async def get_rag_context(self, query: str) -> str:
         """Retrieve relevant knowledge from the database using RAG."""
         if not embeddings_configured() or not db_configured():
@@ -249,7 +340,6 @@ class ChatbotService:
             return ""
         
         try:
-            import asyncio
             print(f"Starting RAG query for: {query[:50]}...")
             # Add 10 second timeout to prevent blocking
             results = await asyncio.wait_for(
@@ -271,6 +361,7 @@ class ChatbotService:
         
         return ""
     
+    @traced("chat.get_response")
     async def get_response(self, message: str, conversation_history: List[ChatMessage] = None) -> str:
         """Generate a response using Gemini API with RAG and function calling."""
         
@@ -314,7 +405,7 @@ class ChatbotService:
                 call_params["tools"] = BOOKING_FUNCTIONS
                 call_params["tool_choice"] = "auto"
             
-            response = self.client.chat.completions.create(**call_params)
+            response = await self.complete("chat", **call_params)
             
             response_message = response.choices[0].message
             
@@ -328,11 +419,12 @@ class ChatbotService:
                     
                     print(f"Executing function: {function_name} with args: {function_args}")
                     
-                    result = await execute_function(function_name, function_args)
+                    with span(f"tool {function_name}", **{"gen_ai.tool.name": function_name}):
+                        result = await execute_function(function_name, function_args)
                     tool_results.append({
                         "tool_call_id": tool_call.id,
                         "role": "tool",
-                        "content": json.dumps(result)
+                        "content": json.dumps(result, default=str)
                     })
                 
                 # Add the assistant message and tool results to get final response
@@ -354,7 +446,8 @@ class ChatbotService:
                 messages.extend(tool_results)
                 
                 # Get final response after function execution
-                final_response = self.client.chat.completions.create(
+                final_response = await self.complete(
+                    "chat_after_tools",
                     model="gemini-2.5-flash",
                     messages=messages,
                     max_tokens=500,
@@ -370,7 +463,7 @@ class ChatbotService:
             print(f"Error calling Gemini API: {e}")
             print(f"Error type: {type(e).__name__}")
             print(f"Full traceback:\n{traceback.format_exc()}")
-            return "I apologize, but I'm experiencing some technical difficulties. Please try again or contact us directly at +92 300 1609087 for immediate assistance."
+            return ERROR_RESPONSE
 
 
 # Singleton instance
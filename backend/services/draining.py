@@ -0,0 +1,57 @@
+"""
+Graceful Draining
+On SIGTERM (or Ctrl+C) uvicorn stops accepting connections, waits up to
+its graceful shutdown timeout for open requests, and only then runs the
+lifespan shutdown. Draining starts at the signal instead: open change
+feed streams are ended so their clients reconnect elsewhere, and new
+chats are turned away, leaving the grace period to the chats in flight.
+"""
+import asyncio
+import signal
+from typing import Callable, List
+
+_draining = False
+_callbacks: List[Callable[[], None]] = []
+
+
+def is_draining() -> bool:
+    """Check if the server is shutting down."""
+    return _draining
+
+
+def begin():
+    """Start draining (once)."""
+    global _draining
+    if _draining:
+        return
+    _draining = True
+    print("Draining: ending live streams and refusing new chats")
+    for callback in _callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Draining error: {e}")
+
+
+def install(*callbacks: Callable[[], None]):
+    """
+    Run `callbacks` when a shutdown signal arrives, before passing the
+    signal on to uvicorn's handler. Call from the lifespan startup, after
+    uvicorn has installed its handlers.
+    """
+    _callbacks.extend(callbacks)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(begin)
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handler)
+        except ValueError:
+            # Not the main thread (e.g. under a test client)
+            return
@@ -1,12 +1,14 @@
 """
 Cohere Embeddings Service for RAG
 """
-import cohere
+import asyncio
 from typing import List, Optional
 from config import COHERE_API_KEY
-from database import get_connection, is_configured as db_configured
+from database import get_connection, is_configured as db_configured, fetch, execute
+from metrics import ExternalCall
+from tracing import traced
 
-# Cohere async client
+# Cohere async client, built on first use (loading the SDK takes a while)
 _client = None
 
 
@@ -14,10 +16,23 @@ def get_client():
     """Get or create async Cohere client."""
     global _client
     if _client is None and COHERE_API_KEY:
+        import cohere
         _client = cohere.AsyncClientV2(api_key=COHERE_API_KEY)
     return _client
 
 
+async def warm_up():
+    """Load the SDK and build the client off the event loop, before the first search."""
+    if COHERE_API_KEY:
+        await asyncio.to_thread(get_client)
+
+
+def _billed_input_tokens(response) -> int:
+    """Input tokens Cohere billed for an embed call, 0 if not reported."""
+    billed = response.meta.billed_units if response.meta else None
+    return int(billed.input_tokens or 0) if billed else 0
+
+
 def is_configured():
     """Check if embeddings service is configured."""
     return bool(COHERE_API_KEY)
@@ -33,12 +48,14 @@ async def embed_text(text: str) -> Optional[List[float]]:
         return None
     
     try:
-        response = await client.embed(
-            texts=[text],
-            model="embed-english-v3.0",
-            input_type="search_document",
-            embedding_types=["float"]
-        )
+        async with ExternalCall("cohere", "embed_document") as call:
+            response = await client.embed(
+                texts=[text],
+                model="embed-english-v3.0",
+                input_type="search_document",
+                embedding_types=["float"]
+            )
+            call.tokens("input", _billed_input_tokens(response))
         return response.embeddings.float_[0]
     except Exception as e:
         print(f"Embedding error: {e}")
@@ -57,18 +74,21 @@ async def embed_query(query: str) -> Optional[List[float]]:
         return None
     
     try:
-        response = await client.embed(
-            texts=[query],
-            model="embed-english-v3.0",
-            input_type="search_query",
-            embedding_types=["float"]
-        )
+        async with ExternalCall("cohere", "embed_query") as call:
+            response = await client.embed(
+                texts=[query],
+                model="embed-english-v3.0",
+                input_type="search_query",
+                embedding_types=["float"]
+            )
+            call.tokens("input", _billed_input_tokens(response))
         return response.embeddings.float_[0]
     except Exception as e:
         print(f"Query embedding error: {e}")
         return None
 
 
+@traced("rag.search_knowledge")
 async def search_knowledge(query: str, top_k: int = 3) -> List[dict]:
     """
     Search the knowledge base using semantic similarity.
@@ -83,15 +103,11 @@ async def search_knowledge(query: str, top_k: int = 3) -> List[dict]:
         return []
     
     try:
-        async with get_connection() as conn:
+        async with get_connection(readonly=True) as conn:
             # Vector similarity search using cosine distance
-            results = await conn.fetch('''
-                SELECT content, category, 
-                       1 - (embedding <=> $1::vector) as similarity
-                FROM knowledge_embeddings
-                ORDER BY embedding <=> $1::vector
-                LIMIT $2
-            ''', str(query_embedding), top_k)
+            results = await fetch(
+                conn, "knowledge_search", str(query_embedding), top_k
+            )
             
             return [
                 {
@@ -119,10 +135,9 @@ async def add_knowledge(content: str, category: str = "general") -> bool:
     
     try:
         async with get_connection() as conn:
-            await conn.execute('''
-                INSERT INTO knowledge_embeddings (content, category, embedding)
-                VALUES ($1, $2, $3::vector)
-            ''', content, category, str(embedding))
+            await execute(
+                conn, "knowledge_insert", content, category, str(embedding)
+            )
         return True
     except Exception as e:
         print(f"Add knowledge error: {e}")
@@ -0,0 +1,114 @@
+"""
+Readiness Checks
+Probes the database (through the pool, so a suspended compute or an
+exhausted pool shows up), pgvector, and the Gemini and Cohere APIs. The
+result is cached for HEALTH_CACHE_SECONDS and concurrent checks share one
+probe, so load balancer polling never adds more than one probe per
+interval.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from config import HEALTH_CACHE_SECONDS, HEALTH_PROBE_TIMEOUT
+from database import check_pools, is_configured as db_configured
+from services import draining
+from services import embeddings
+from services.chatbot import chatbot_service
+
+# The last probe results and when they were taken, and the probe in progress
+_checks: Optional[Dict[str, Any]] = None
+_checked_at = 0.0
+_probe: Optional[asyncio.Task] = None
+
+
+async def _api(call) -> Dict[str, Any]:
+    """Time one API call; any answer within the timeout means reachable."""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(call(), HEALTH_PROBE_TIMEOUT)
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": str(e) or type(e).__name__}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def _gemini():
+    client = chatbot_service.get_client().with_options(max_retries=0)
+    await client.models.list()
+
+
+async def _cohere():
+    await embeddings.get_client().models.list(
+        page_size=1, request_options={"max_retries": 0}
+    )
+
+
+async def _run_probes() -> Dict[str, Any]:
+    """Probe every configured dependency at once."""
+    # Load the SDKs first (if startup has not yet), so it is not timed
+    await asyncio.gather(chatbot_service.warm_up(), embeddings.warm_up())
+
+    probes = {}
+    if db_configured():
+        probes["database"] = check_pools(HEALTH_PROBE_TIMEOUT)
+    if chatbot_service.is_configured():
+        probes["gemini"] = _api(_gemini)
+    if embeddings.is_configured():
+        probes["cohere"] = _api(_cohere)
+
+    results = dict(zip(probes, await asyncio.gather(*probes.values())))
+    checks = {name: result for name, result in results.items() if name != "database"}
+    for pool, result in results.get("database", {}).items():
+        version = result.pop("pgvector", None)
+        checks[f"database_{pool}"] = result
+        if result["ok"]:
+            checks[f"pgvector_{pool}"] = {"ok": version is not None, "version": version}
+    if db_configured() and not results["database"]:
+        checks["database_primary"] = {"ok": False, "error": "Database not initialized"}
+    return checks
+
+
+async def _refresh():
+    """Probe and cache the result; a probe that fails outright is a failed check."""
+    global _checks, _checked_at, _probe
+    try:
+        _checks = await _run_probes()
+    except Exception as e:
+        print(f"Readiness probe error: {e}")
+        _checks = {"probe": {"ok": False, "error": str(e) or type(e).__name__}}
+    finally:
+        _checked_at = time.monotonic()
+        _probe = None
+
+
+async def check() -> Dict[str, Any]:
+    """
+    Readiness: ready unless draining for shutdown, or the database or
+    pgvector check (or the probe itself) failed. An unreachable Gemini or Cohere makes the
+    status "degraded" without taking the instance out of rotation, since
+    every instance shares them.
+    """
+    global _probe
+
+    if _checks is None or time.monotonic() - _checked_at >= HEALTH_CACHE_SECONDS:
+        if _probe is None:
+            _probe = asyncio.create_task(_refresh())
+        # Shielded: a client hanging up must not cancel the shared probe
+        await asyncio.shield(_probe)
+
+    critical = [c for name, c in _checks.items() if name.startswith(("database_", "pgvector_", "probe"))]
+    if draining.is_draining():
+        status = "draining"
+    elif not all(c["ok"] for c in critical):
+        status = "unavailable"
+    elif not all(c["ok"] for c in _checks.values()):
+        status = "degraded"
+    else:
+        status = "ready"
+    return {
+        "ready": status in ("ready", "degraded"),
+        "status": status,
+        "checks": _checks,
+        "age_seconds": round(time.monotonic() - _checked_at, 1),
+    }
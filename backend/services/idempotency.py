@@ -0,0 +1,174 @@
+"""
+Idempotency Keys
+A request sent with an Idempotency-Key header runs once. Its response is
+stored under the key, and a retry with the same key gets that response
+back instead of repeating the work. A retry that arrives while the
+original is still running waits for its result.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from config import IDEMPOTENCY_KEY_TTL_HOURS, IDEMPOTENCY_WAIT_SECONDS, IDEMPOTENCY_LOCK_SECONDS
+from database import get_connection, is_available, fetchrow, fetchval, execute
+
+KEY_MAX_LENGTH = 255
+
+# How often a retry checks on an original running in another process
+POLL_INTERVAL = 0.25
+
+IN_PROGRESS_MESSAGE = "A request with this Idempotency-Key is still in progress. Retry shortly."
+MISMATCH_MESSAGE = "Invalid Idempotency-Key: it was already used for a different request"
+
+# Requests running in this process by (scope, key). Each future resolves
+# to the stored outcome, or None if the request failed without one.
+_running: Dict[Tuple[str, str], asyncio.Future] = {}
+_prune_task = None
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    """Hash identifying a request, so a key cannot be reused for another one."""
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _replay(outcome: Dict[str, Any], request_hash: str) -> Dict[str, Any]:
+    """The result for a retry of a request whose outcome is stored."""
+    if outcome["request_hash"] != request_hash:
+        return {"success": False, "error": MISMATCH_MESSAGE}
+    return {
+        "success": True,
+        "status_code": outcome["status_code"],
+        "body": outcome["body"],
+        "replayed": True
+    }
+
+
+async def _execute(scope: str, key: str, request_hash: str, work) -> Optional[Dict[str, Any]]:
+    """
+    Run the request for a claimed key and store its response. Server
+    errors (5xx) are not stored, so a retry runs the request again.
+    """
+    try:
+        status_code, body = await work()
+    except BaseException:
+        async with get_connection() as conn:
+            await execute(conn, "idempotency_release", scope, key)
+        raise
+
+    outcome = {"request_hash": request_hash, "status_code": status_code, "body": body}
+    async with get_connection() as conn:
+        if status_code >= 500:
+            await execute(conn, "idempotency_release", scope, key)
+        else:
+            await execute(conn, "idempotency_store", scope, key, status_code, json.dumps(body))
+    return outcome
+
+
+async def run(
+    scope: str,
+    key: str,
+    request_hash: str,
+    work: Callable[[], Awaitable[Tuple[int, Any]]]
+) -> Dict[str, Any]:
+    """
+    Run `work` (returning a status code and JSON-ready body) once per key
+    within `scope`. Returns the status code and body, with `replayed` set
+    when they are the stored response of an earlier request. Fails if the
+    key was used for a different request, or if the original request is
+    still running after IDEMPOTENCY_WAIT_SECONDS. When the database is not
+    available `work` simply runs.
+    """
+    if not key or len(key) > KEY_MAX_LENGTH:
+        return {"success": False, "error": f"Invalid Idempotency-Key: use 1 to {KEY_MAX_LENGTH} characters"}
+
+    # Without a database (unconfigured, or init_db failed) run unprotected
+    if not is_available():
+        status_code, body = await work()
+        return {"success": True, "status_code": status_code, "body": body, "replayed": False}
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        running = _running.get((scope, key))
+        if running is not None:
+            # Running in this process: wait for it without touching the database
+            try:
+                outcome = await asyncio.wait_for(
+                    asyncio.shield(running), max(deadline - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                return {"success": False, "error": IN_PROGRESS_MESSAGE}
+            if outcome is None:
+                continue
+            return _replay(outcome, request_hash)
+
+        running = asyncio.get_running_loop().create_future()
+        _running[(scope, key)] = running
+        try:
+            async with get_connection() as conn:
+                claimed = await fetchval(
+                    conn, "idempotency_claim", scope, key, request_hash,
+                    IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_KEY_TTL_HOURS * 60 * 60
+                )
+                stored = None if claimed else await fetchrow(conn, "idempotency_get", scope, key)
+
+            if claimed:
+                outcome = await _execute(scope, key, request_hash, work)
+                running.set_result(outcome)
+                return {
+                    "success": True,
+                    "status_code": outcome["status_code"],
+                    "body": outcome["body"],
+                    "replayed": False
+                }
+        finally:
+            if not running.done():
+                running.set_result(None)
+            del _running[(scope, key)]
+
+        # Claimed by another process, or released in between
+        if stored is None:
+            continue
+        if stored["request_hash"] != request_hash:
+            return {"success": False, "error": MISMATCH_MESSAGE}
+        if stored["status_code"] is not None:
+            return _replay({
+                "request_hash": stored["request_hash"],
+                "status_code": stored["status_code"],
+                "body": json.loads(stored["response"])
+            }, request_hash)
+        if time.monotonic() >= deadline:
+            return {"success": False, "error": IN_PROGRESS_MESSAGE}
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def prune():
+    """Delete stored responses older than the TTL."""
+    async with get_connection() as conn:
+        await execute(conn, "idempotency_prune", IDEMPOTENCY_KEY_TTL_HOURS * 60 * 60)
+
+
+async def _prune_hourly():
+    """Keep the idempotency store to the TTL."""
+    while True:
+        try:
+            await prune()
+        except Exception as e:
+            print(f"Idempotency prune error: {e}")
+        await asyncio.sleep(60 * 60)
+
+
+def start():
+    """Start pruning expired keys."""
+    global _prune_task
+    _prune_task = asyncio.create_task(_prune_hourly())
+
+
+def stop():
+    """Stop pruning."""
+    global _prune_task
+    if _prune_task:
+        _prune_task.cancel()
+        _prune_task = None
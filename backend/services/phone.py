@@ -0,0 +1,43 @@
+"""
+Phone Number Normalization
+Converts customer-entered phone numbers to E.164 for storage and lookup
+"""
+import re
+from typing import Optional
+from config import DEFAULT_COUNTRY_CODE
+
+# E.164 allows at most 15 digits; anything shorter than 8 is not a full number
+_MIN_DIGITS = 8
+_MAX_DIGITS = 15
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(raw: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalize a phone number to E.164 ("+923001234567").
+    Accepts "+92 300 1234567", "0092...", "0300-1234567", "923001234567"
+    and "3001234567". Returns None if the input is not a plausible number.
+    """
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return None
+
+    if raw.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    elif digits.startswith("0"):
+        # National trunk prefix
+        number = country_code + digits[1:]
+    elif digits.startswith(country_code) and len(digits) > _MIN_DIGITS + len(country_code):
+        number = digits
+    else:
+        number = country_code + digits
+
+    if not _MIN_DIGITS <= len(number) <= _MAX_DIGITS or number.startswith("0"):
+        return None
+    return "+" + number
@@ -0,0 +1,114 @@
+"""
+Booking Slots
+The bookable slots (a time slot of the lawn or a hall, with a capacity per
+date), cached in memory. Every worker reloads them when the slots table
+changes.
+"""
+import asyncio
+from typing import Dict, List, Optional
+from database import get_connection, listen, fetch
+
+CHANNEL = "booking_slots"
+
+# Every slot by id, and the active ones in start time order
+_by_id: Dict[int, Dict] = {}
+_active: List[Dict] = []
+
+
+def code(slot: Dict) -> str:
+    """A slot's public name, e.g. "lawn-evening"."""
+    return f"{slot['resource']}-{slot['name']}"
+
+
+def active() -> List[Dict]:
+    """Active slots, in start time order."""
+    return _active
+
+
+def get(slot_id: Optional[int]) -> Optional[Dict]:
+    """A slot by id, active or not."""
+    return _by_id.get(slot_id)
+
+
+def capacities(slot_id: Optional[int] = None) -> Dict[int, int]:
+    """Capacity per date of every active slot, or only of `slot_id`."""
+    return {
+        slot["id"]: slot["capacity"]
+        for slot in _active if slot_id is None or slot["id"] == slot_id
+    }
+
+
+def resolve(value: str) -> Optional[Dict]:
+    """
+    Find an active slot by code ("lawn-evening"), id, or name ("evening")
+    where only one resource has a slot of that name. None if no single
+    slot matches.
+    """
+    value = str(value).strip().lower()
+    if value.isdigit():
+        slot = _by_id.get(int(value))
+        return slot if slot and slot["active"] else None
+    matches = [s for s in _active if code(s) == value]
+    if not matches:
+        matches = [s for s in _active if s["name"] == value]
+    return matches[0] if len(matches) == 1 else None
+
+
+def first_free(booked: Dict[int, int], preferred: Optional[int] = None) -> Optional[int]:
+    """
+    The active slot a booking takes given the bookings per slot on its
+    date: `preferred` if it has room, else the first with room in start
+    time order. None if every slot is full.
+    """
+    order = sorted(_active, key=lambda slot: slot["id"] != preferred)
+    for slot in order:
+        if booked.get(slot["id"], 0) < slot["capacity"]:
+            return slot["id"]
+    return None
+
+
+def describe(slot: Dict) -> Dict:
+    """A slot as returned by the API."""
+    return {
+        "id": slot["id"],
+        "slot": code(slot),
+        "resource": slot["resource"],
+        "name": slot["name"],
+        "starts_at": slot["starts_at"].strftime("%H:%M"),
+        "ends_at": slot["ends_at"].strftime("%H:%M"),
+        "capacity": slot["capacity"],
+    }
+
+
+async def load():
+    """(Re)load every slot."""
+    global _by_id, _active
+    async with get_connection(readonly=True, use_primary=True) as conn:
+        rows = await fetch(conn, "slots")
+    slots = [dict(row) for row in rows]
+    _by_id = {slot["id"]: slot for slot in slots}
+    _active = [slot for slot in slots if slot["active"]]
+
+
+async def _reload():
+    try:
+        await load()
+    except Exception as e:
+        print(f"Slots reload error: {e}")
+
+
+def _on_notify(payload: str):
+    """Reload the slots after a change by any worker or by hand."""
+    asyncio.get_running_loop().create_task(_reload())
+
+
+async def start() -> bool:
+    """Load the slots and follow changes to them."""
+    try:
+        await listen(CHANNEL, _on_notify, on_reconnect=load)
+        await load()
+        return True
+    except Exception as e:
+        print(f"Slots error: {e}")
+        return False
+
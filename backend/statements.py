@@ -0,0 +1,426 @@
+"""
+Prepared Statement Registry
+Named SQL for the hot booking and RAG queries, prepared once per connection
+"""
+from config import PHONE_SUFFIX_DIGITS
+
+# Columns returned for a full booking row
+BOOKING_COLUMNS = '''
+    id, customer_name, customer_phone, customer_email,
+    event_type, event_date, guest_count, package_type,
+    special_requests, status, created_at, version, slot_id
+'''
+
+# Statuses that do not occupy a slot on the event date
+INACTIVE_STATUSES = ("cancelled", "rejected")
+_INACTIVE_SQL = "('cancelled', 'rejected')"
+
+# Phone lookups match the normalized number, or any number with the same
+# last PHONE_SUFFIX_DIGITS digits (served by the suffix expression index)
+_PHONE_MATCH_SQL = "customer_phone_e164 = $1"
+if PHONE_SUFFIX_DIGITS > 0:
+    _PHONE_MATCH_SQL += (
+        f" OR right(customer_phone_e164, {PHONE_SUFFIX_DIGITS})"
+        f" = right($1, {PHONE_SUFFIX_DIGITS})"
+    )
+
+# Text searched by the dashboard's q= filter. The trigram index in init_db
+# is built on exactly this expression, so keep the two in sync.
+SEARCH_DOCUMENT_SQL = (
+    "(customer_name || ' ' || customer_phone || ' ' || COALESCE(customer_phone_e164, '')"
+    " || ' ' || COALESCE(customer_email, '') || ' ' || COALESCE(special_requests, ''))"
+)
+# $1 is the search text, $2 the same text as an escaped ILIKE '%...%' pattern.
+# Both predicates are served by the trigram index.
+_SEARCH_MATCH_SQL = f"($1::text <% {SEARCH_DOCUMENT_SQL} OR {SEARCH_DOCUMENT_SQL} ILIKE $2::text)"
+
+# Statements that need an extension which may not be installed; they are
+# only prepared up front when it is
+STATEMENT_EXTENSIONS = {
+    "bookings_search": "pg_trgm",
+    "bookings_search_count": "pg_trgm",
+}
+
+# First key of the per-date advisory lock taken before capacity checks
+DATE_LOCK_NAMESPACE = 7301
+
+STATEMENTS = {
+    # Serializes capacity checks for one date; released at transaction end
+    "booking_lock_date": f'''
+        SELECT pg_advisory_xact_lock({DATE_LOCK_NAMESPACE}, $1::date - DATE '2000-01-01')
+    ''',
+
+    # Inserts into slot $9, or with $9 NULL the first slot in start time
+    # order, only while that slot has room on the date. Both lookups are on
+    # primary keys. Run under booking_lock_date so concurrent inserts see
+    # each other.
+    "booking_insert": f'''
+        WITH slot AS (
+            SELECT s.id
+            FROM slots s
+            LEFT JOIN slot_bookings sb ON sb.event_date = $5::date AND sb.slot_id = s.id
+            WHERE s.active
+            AND ($9::integer IS NULL OR s.id = $9::integer)
+            AND COALESCE(sb.booked, 0) < s.capacity
+            ORDER BY s.starts_at, s.id
+            LIMIT 1
+        )
+        INSERT INTO bookings
+        (customer_name, customer_phone, customer_email, event_type,
+         event_date, guest_count, package_type, special_requests, status,
+         customer_phone_e164, slot_id)
+        SELECT $1::varchar, $2::varchar, $3::varchar, $4::varchar,
+               $5::date, $6::integer, $7::varchar, $8::text, 'pending',
+               $10::varchar, slot.id
+        FROM slot
+        RETURNING id, customer_name, customer_phone, event_type,
+                  event_date, guest_count, status, created_at, version, slot_id
+    ''',
+
+    "booking_by_id": f'''
+        SELECT {BOOKING_COLUMNS}
+        FROM bookings
+        WHERE id = $1
+    ''',
+
+    "bookings_by_phone": f'''
+        SELECT {BOOKING_COLUMNS}
+        FROM bookings
+        WHERE {_PHONE_MATCH_SQL}
+        ORDER BY event_date DESC
+    ''',
+
+    "booking_event_date": '''
+        SELECT event_date, status, version, slot_id FROM bookings WHERE id = $1
+    ''',
+
+    "booking_for_update": '''
+        SELECT event_date, status, version, slot_id FROM bookings WHERE id = $1
+        FOR UPDATE
+    ''',
+
+    # Single update shape: NULL parameters leave the column unchanged.
+    # The previous date, status and slot are returned so callers can
+    # invalidate whatever they cached for where the booking moved away from.
+    # The booking ends up in slot $6 if given; otherwise it keeps its slot,
+    # or when it moves date or is reactivated takes the first slot with room,
+    # preferring the one it had. Updates that leave it active in a slot and
+    # date it did not already occupy only apply while that slot has room.
+    # With $7 set, the update only applies if the booking is at that version.
+    "booking_update": f'''
+        WITH previous AS (
+            SELECT id, event_date AS previous_event_date, status AS previous_status,
+                   slot_id AS previous_slot_id,
+                   COALESCE($2::date, event_date) AS target_date,
+                   COALESCE($5::varchar, status) AS target_status
+            FROM bookings
+            WHERE id = $1
+            AND ($7::integer IS NULL OR version = $7::integer)
+            FOR UPDATE
+        ),
+        target AS (
+            SELECT p.*,
+                   p.previous_status NOT IN {_INACTIVE_SQL}
+                   AND p.target_date = p.previous_event_date AS stays,
+                   CASE
+                       WHEN $6::integer IS NOT NULL THEN $6::integer
+                       WHEN p.target_status IN {_INACTIVE_SQL}
+                            OR ($2::date IS NULL AND $5::varchar IS NULL)
+                            OR (p.previous_status NOT IN {_INACTIVE_SQL}
+                                AND p.target_date = p.previous_event_date
+                                AND p.previous_slot_id IS NOT NULL)
+                       THEN p.previous_slot_id
+                       ELSE (
+                           SELECT s.id
+                           FROM slots s
+                           LEFT JOIN slot_bookings sb ON sb.event_date = p.target_date AND sb.slot_id = s.id
+                           WHERE s.active
+                           AND COALESCE(sb.booked, 0) < s.capacity
+                           ORDER BY s.id = p.previous_slot_id DESC, s.starts_at, s.id
+                           LIMIT 1
+                       )
+                   END AS target_slot_id
+            FROM previous p
+        )
+        UPDATE bookings b
+        SET event_date = t.target_date,
+            guest_count = COALESCE($3::integer, b.guest_count),
+            special_requests = COALESCE($4::text, b.special_requests),
+            status = t.target_status,
+            slot_id = t.target_slot_id,
+            updated_at = NOW()
+        FROM target t
+        WHERE b.id = t.id
+        AND (
+            t.target_status IN {_INACTIVE_SQL}
+            OR ($2::date IS NULL AND $5::varchar IS NULL AND $6::integer IS NULL)
+            OR (t.stays AND t.target_slot_id = t.previous_slot_id)
+            OR (
+                SELECT s.capacity > COALESCE((
+                    SELECT sb.booked FROM slot_bookings sb
+                    WHERE sb.event_date = t.target_date AND sb.slot_id = s.id
+                ), 0)
+                FROM slots s
+                WHERE s.id = t.target_slot_id AND s.active
+            )
+        )
+        RETURNING b.id, b.customer_name, b.event_type, b.event_date,
+                  b.guest_count, b.status, b.updated_at, b.version, b.slot_id,
+                  t.previous_event_date, t.previous_status, t.previous_slot_id
+    ''',
+
+    "bookings_event_dates": '''
+        SELECT id, event_date, status, slot_id FROM bookings WHERE id = ANY($1::integer[])
+    ''',
+
+    "bookings_for_update": '''
+        SELECT id, event_date, status, slot_id FROM bookings
+        WHERE id = ANY($1::integer[])
+        ORDER BY id
+        FOR UPDATE
+    ''',
+
+    # Same NULL-means-unchanged shape as booking_update, for many ids at once.
+    # $6 holds the slot each booking in $1 ends up in, chosen by the caller.
+    # Rows that already hold the requested values are not written or returned.
+    "bookings_bulk_update": '''
+        UPDATE bookings b
+        SET event_date = COALESCE($2::date, b.event_date),
+            guest_count = COALESCE($3::integer, b.guest_count),
+            special_requests = COALESCE($4::text, b.special_requests),
+            status = COALESCE($5::varchar, b.status),
+            slot_id = t.slot_id,
+            updated_at = NOW()
+        FROM unnest($1::integer[], $6::integer[]) AS t(id, slot_id)
+        WHERE b.id = t.id
+        AND (b.event_date, b.guest_count, b.special_requests, b.status, b.slot_id) IS DISTINCT FROM (
+            COALESCE($2::date, b.event_date), COALESCE($3::integer, b.guest_count),
+            COALESCE($4::text, b.special_requests), COALESCE($5::varchar, b.status), t.slot_id
+        )
+        RETURNING b.id, b.customer_name, b.customer_phone, b.customer_email,
+                  b.event_type, b.event_date, b.guest_count, b.package_type,
+                  b.special_requests, b.status, b.created_at, b.updated_at,
+                  b.version, b.slot_id
+    ''',
+
+    "booking_delete": '''
+        DELETE FROM bookings WHERE id = $1
+        RETURNING event_date, status, slot_id
+    ''',
+
+    "slots": '''
+        SELECT id, resource, name, starts_at, ends_at, capacity, active
+        FROM slots
+        ORDER BY starts_at, id
+    ''',
+
+    # Active bookings per slot, from the slot_bookings occupancy table
+    "slot_bookings_in_range": '''
+        SELECT event_date, slot_id, booked
+        FROM slot_bookings
+        WHERE event_date BETWEEN $1 AND $2
+        AND booked <> 0
+    ''',
+
+    "slot_bookings_for_dates": '''
+        SELECT event_date, slot_id, booked
+        FROM slot_bookings
+        WHERE event_date = ANY($1::date[])
+        AND booked <> 0
+    ''',
+
+    # Dates after $1 (up to $2 days out) with a free place in any of the
+    # active slots $4 (all active slots when NULL), optionally restricted to
+    # ISO weekdays $3 (1 = Monday ... 7 = Sunday)
+    "available_dates_after": '''
+        SELECT d::date AS event_date,
+               SUM(COALESCE(sb.booked, 0)) AS booked,
+               SUM(GREATEST(s.capacity - COALESCE(sb.booked, 0), 0)) AS free
+        FROM generate_series($1::date + 1, $1::date + $2::integer, interval '1 day') AS d
+        CROSS JOIN slots s
+        LEFT JOIN slot_bookings sb ON sb.event_date = d::date AND sb.slot_id = s.id
+        WHERE s.active
+        AND ($4::integer[] IS NULL OR s.id = ANY($4::integer[]))
+        AND ($3::integer[] IS NULL
+             OR EXTRACT(ISODOW FROM d)::integer = ANY($3::integer[]))
+        GROUP BY d
+        HAVING SUM(GREATEST(s.capacity - COALESCE(sb.booked, 0), 0)) > 0
+        ORDER BY d
+        LIMIT $5
+    ''',
+
+    # Keyset pages over (event_date, id), newest first. The optional total is
+    # an uncorrelated subquery, evaluated once and only when requested.
+    # Row comparisons do not prune partitions, so the pages after the first
+    # repeat the bound on event_date alone.
+    "bookings_page": '''
+        SELECT id, customer_name, customer_phone, customer_email,
+               event_type, event_date, guest_count, package_type,
+               special_requests, status, created_at, updated_at, version, slot_id,
+               CASE WHEN $3::boolean THEN (SELECT COUNT(*) FROM bookings) END AS total
+        FROM bookings
+        ORDER BY event_date DESC, id DESC
+        LIMIT $1 OFFSET $2
+    ''',
+
+    "bookings_page_after": '''
+        SELECT id, customer_name, customer_phone, customer_email,
+               event_type, event_date, guest_count, package_type,
+               special_requests, status, created_at, updated_at, version, slot_id,
+               CASE WHEN $4::boolean THEN (SELECT COUNT(*) FROM bookings) END AS total
+        FROM bookings
+        WHERE (event_date, id) < ($2::date, $3::integer)
+        AND event_date <= $2::date
+        ORDER BY event_date DESC, id DESC
+        LIMIT $1
+    ''',
+
+    "bookings_page_by_status": '''
+        SELECT id, customer_name, customer_phone, customer_email,
+               event_type, event_date, guest_count, package_type,
+               special_requests, status, created_at, updated_at, version, slot_id,
+               CASE WHEN $4::boolean THEN
+                   (SELECT COUNT(*) FROM bookings WHERE status = $1)
+               END AS total
+        FROM bookings
+        WHERE status = $1
+        ORDER BY event_date DESC, id DESC
+        LIMIT $2 OFFSET $3
+    ''',
+
+    "bookings_page_by_status_after": '''
+        SELECT id, customer_name, customer_phone, customer_email,
+               event_type, event_date, guest_count, package_type,
+               special_requests, status, created_at, updated_at, version, slot_id,
+               CASE WHEN $5::boolean THEN
+                   (SELECT COUNT(*) FROM bookings WHERE status = $1)
+               END AS total
+        FROM bookings
+        WHERE status = $1
+        AND (event_date, id) < ($3::date, $4::integer)
+        AND event_date <= $3::date
+        ORDER BY event_date DESC, id DESC
+        LIMIT $2
+    ''',
+
+    # Fuzzy search ranked by trigram word similarity, paged by offset, with
+    # an optional status filter ($3) and total ($6)
+    "bookings_search": f'''
+        SELECT id, customer_name, customer_phone, customer_email,
+               event_type, event_date, guest_count, package_type,
+               special_requests, status, created_at, updated_at, version, slot_id,
+               CASE WHEN $6::boolean THEN (
+                   SELECT COUNT(*) FROM bookings
+                   WHERE {_SEARCH_MATCH_SQL}
+                   AND ($3::varchar IS NULL OR status = $3::varchar)
+               ) END AS total
+        FROM bookings
+        WHERE {_SEARCH_MATCH_SQL}
+        AND ($3::varchar IS NULL OR status = $3::varchar)
+        ORDER BY word_similarity($1::text, {SEARCH_DOCUMENT_SQL}) DESC,
+                 event_date DESC, id DESC
+        LIMIT $4 OFFSET $5
+    ''',
+
+    "bookings_search_count": f'''
+        SELECT COUNT(*) FROM bookings
+        WHERE {_SEARCH_MATCH_SQL}
+        AND ($3::varchar IS NULL OR status = $3::varchar)
+    ''',
+
+    "bookings_revision": '''
+        SELECT revision FROM booking_revision
+    ''',
+
+    # Changes logged after revision $1, for at most $2 whole revisions
+    "booking_changes_after": '''
+        SELECT revision,
+               json_build_object('operation', operation, 'id', booking_id, 'booking', booking)::text AS change
+        FROM booking_changes
+        WHERE revision IN (
+            SELECT DISTINCT revision FROM booking_changes
+            WHERE revision > $1
+            ORDER BY revision
+            LIMIT $2
+        )
+        ORDER BY revision, id
+    ''',
+
+    "booking_changes_oldest": '''
+        SELECT MIN(revision) FROM booking_changes
+    ''',
+
+    "booking_changes_prune": '''
+        DELETE FROM booking_changes
+        WHERE changed_at < NOW() - make_interval(secs => $1::double precision)
+    ''',
+
+    # Claims an idempotency key for a new request. A key still running
+    # after $4 seconds (its process died) or stored over $5 seconds ago is
+    # claimed afresh. Returns no row if the key is taken.
+    "idempotency_claim": '''
+        INSERT INTO idempotency_keys (scope, key, request_hash)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (scope, key) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash,
+            status_code = NULL,
+            response = NULL,
+            created_at = NOW()
+        WHERE (idempotency_keys.status_code IS NULL
+               AND idempotency_keys.created_at < NOW() - make_interval(secs => $4::double precision))
+           OR idempotency_keys.created_at < NOW() - make_interval(secs => $5::double precision)
+        RETURNING TRUE
+    ''',
+
+    "idempotency_get": '''
+        SELECT request_hash, status_code, response::text AS response
+        FROM idempotency_keys
+        WHERE scope = $1 AND key = $2
+    ''',
+
+    "idempotency_store": '''
+        UPDATE idempotency_keys
+        SET status_code = $3, response = $4::jsonb
+        WHERE scope = $1 AND key = $2
+    ''',
+
+    "idempotency_release": '''
+        DELETE FROM idempotency_keys
+        WHERE scope = $1 AND key = $2 AND status_code IS NULL
+    ''',
+
+    "idempotency_prune": '''
+        DELETE FROM idempotency_keys
+        WHERE created_at < NOW() - make_interval(secs => $1::double precision)
+    ''',
+
+    "booking_stats": '''
+        SELECT dimension, key, count FROM booking_stats WHERE count <> 0
+    ''',
+
+    "bookings_count": '''
+        SELECT COUNT(*) FROM bookings
+    ''',
+
+    "bookings_count_by_status": '''
+        SELECT COUNT(*) FROM bookings WHERE status = $1
+    ''',
+
+    "knowledge_search": '''
+        SELECT content, category,
+               1 - (embedding <=> $1::vector) as similarity
+        FROM knowledge_embeddings
+        ORDER BY embedding <=> $1::vector
+        LIMIT $2
+    ''',
+
+    "knowledge_insert": '''
+        INSERT INTO knowledge_embeddings (content, category, embedding)
+        VALUES ($1, $2, $3::vector)
+    ''',
+
+    # Readiness probe: a round trip that also finds the pgvector version
+    "health_vector_version": '''
+        SELECT extversion FROM pg_extension WHERE extname = 'vector'
+    ''',
+}
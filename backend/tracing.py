@@ -0,0 +1,96 @@
+"""
+OpenTelemetry Tracing
+With TRACING_EXPORTER set, each request is traced from FastAPI's own
+request span through RAG, every SQL statement, each Gemini completion and
+each booking tool call. Traces are head sampled and written to a file,
+the console, or an OTLP collector. With tracing off, spans cost a no-op
+context manager.
+"""
+import contextlib
+import functools
+from typing import Optional
+from config import TRACING_EXPORTER, TRACING_FILE, TRACING_OTLP_ENDPOINT, TRACING_SAMPLE_RATIO, TRACING_SERVICE_NAME
+
+_NOOP = contextlib.nullcontext()
+
+_tracer = None
+_provider = None
+
+
+def setup() -> bool:
+    """Configure the tracer from the environment. False if tracing is off."""
+    global _tracer, _provider
+    if TRACING_EXPORTER in ("", "none"):
+        return False
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+    elif TRACING_EXPORTER == "file":
+        # One JSON span per line
+        exporter = ConsoleSpanExporter(
+            out=open(TRACING_FILE, "a", buffering=1),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    elif TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        print(f"[WARNING] Unknown TRACING_EXPORTER '{TRACING_EXPORTER}' (tracing disabled)")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("starcrescent")
+    return True
+
+
+def shutdown():
+    """Flush buffered spans."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def span(name: str, kind: Optional[str] = None, **attributes):
+    """
+    Context manager for a span that is a child of the current one. `kind`
+    is a SpanKind name such as "CLIENT"; attributes with None values are
+    left out.
+    """
+    if _tracer is None:
+        return _NOOP
+    from opentelemetry.trace import SpanKind
+    return _tracer.start_as_current_span(
+        name,
+        kind=SpanKind[kind] if kind else SpanKind.INTERNAL,
+        attributes={k: v for k, v in attributes.items() if v is not None}
+    )
+
+
+def traced(name: str):
+    """Decorator running an async function in a span."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def set_attributes(**attributes):
+    """Add attributes to the current span, if tracing."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attributes({k: v for k, v in attributes.items() if v is not None})
+
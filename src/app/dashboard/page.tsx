@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Trash2, Check, X, Clock, Calendar, Users, Mail, Phone, Package, FileText } from 'lucide-react';
 
 interface Booking {
@@ -16,10 +16,32 @@ interface Booking {
   status: string;
   created_at: string;
   updated_at: string | null;
+  version?: number;
+  slot?: string | null;
 }
 
+interface BookingChange {
+  operation: 'insert' | 'update' | 'delete' | 'truncate' | 'archive';
+  id: number | null;
+  booking: Booking | null;
+}
+
+// Newest event first, matching the order of GET /api/bookings/
+const compareBookings = (a: Booking, b: Booking) =>
+  b.event_date.localeCompare(a.event_date) || b.id - a.id;
+
 const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
 
+// Time of this dashboard's last booking change, sent back with reads so they
+// see it even when the backend reads from a lagging replica
+let lastWriteAt: string | null = null;
+
+const readHeaders = (): HeadersInit => (lastWriteAt ? { 'Last-Write-At': lastWriteAt } : {});
+
+const rememberWrite = (response: Response) => {
+  lastWriteAt = response.headers.get('Last-Write-At') ?? lastWriteAt;
+};
+
 const statusColors = {
   pending: 'bg-yellow-100 text-yellow-800 border-yellow-300',
   confirmed: 'bg-green-100 text-green-800 border-green-300',
@@ -41,20 +63,80 @@ export default function Dashboard() {
   const [statusFilter, setStatusFilter] = useState<string>('');
   const [selectedBooking, setSelectedBooking] = useState<Booking | null>(null);
   const [total, setTotal] = useState(0);
+  const [statusCounts, setStatusCounts] = useState<Record<string, number>>({});
+
+  // True while the live change feed is connected; the list is then patched
+  // from it instead of being reloaded after every action
+  const liveRef = useRef(false);
 
   useEffect(() => {
     fetchBookings();
   }, [statusFilter]);
 
+  useEffect(() => {
+    const source = new EventSource(`${BACKEND_URL}/api/bookings/changes`);
+    source.onopen = () => {
+      liveRef.current = true;
+    };
+    source.addEventListener('reset', () => {
+      fetchBookings();
+    });
+    source.addEventListener('changes', (event) => {
+      const { changes } = JSON.parse((event as MessageEvent).data) as { changes: BookingChange[] };
+      applyChanges(changes);
+    });
+    source.onerror = () => {
+      liveRef.current = false;
+    };
+    return () => source.close();
+  }, [statusFilter]);
+
+  const applyChanges = (changes: BookingChange[]) => {
+    if (changes.some((change) => change.operation === 'truncate' || change.operation === 'archive')) {
+      fetchBookings();
+      return;
+    }
+    setBookings((current) => {
+      const byId = new Map(current.map((booking) => [booking.id, booking]));
+      for (const change of changes) {
+        byId.delete(change.id as number);
+        const booking = change.booking;
+        if (booking && (!statusFilter || booking.status === statusFilter)) {
+          byId.set(booking.id, booking);
+        }
+      }
+      return Array.from(byId.values()).sort(compareBookings);
+    });
+    setSelectedBooking((current) => {
+      const change = current && changes.find((c) => c.id === current.id);
+      return change ? change.booking : current;
+    });
+    fetchStats();
+  };
+
+  const fetchStats = async () => {
+    try {
+      const response = await fetch(`${BACKEND_URL}/api/bookings/stats`, { headers: readHeaders() });
+      if (response.ok) {
+        const data = await response.json();
+        setStatusCounts(data.by_status || {});
+        setTotal(statusFilter ? data.by_status?.[statusFilter] ?? 0 : data.total ?? 0);
+      }
+    } catch {
+      // Stats are optional; the booking list still loads
+    }
+  };
+
   const fetchBookings = async () => {
     setLoading(true);
     setError(null);
+    fetchStats();
     try {
       const url = statusFilter
         ? `${BACKEND_URL}/api/bookings/?status=${statusFilter}`
         : `${BACKEND_URL}/api/bookings/`;
 
-      const response = await fetch(url);
+      const response = await fetch(url, { headers: readHeaders() });
       if (!response.ok) {
         throw new Error('Failed to fetch bookings');
       }
@@ -81,8 +163,11 @@ export default function Dashboard() {
       if (!response.ok) {
         throw new Error('Failed to update booking');
       }
+      rememberWrite(response);
 
-      await fetchBookings();
+      if (!liveRef.current) {
+        await fetchBookings();
+      }
       if (selectedBooking?.id === bookingId) {
         setSelectedBooking(null);
       }
@@ -104,8 +189,11 @@ export default function Dashboard() {
       if (!response.ok) {
         throw new Error('Failed to delete booking');
       }
+      rememberWrite(response);
 
-      await fetchBookings();
+      if (!liveRef.current) {
+        await fetchBookings();
+      }
       if (selectedBooking?.id === bookingId) {
         setSelectedBooking(null);
       }
@@ -150,19 +238,19 @@ export default function Dashboard() {
           <div className="bg-white p-6 rounded-lg shadow-md border-l-4 border-yellow-500">
             <div className="text-sm text-gray-600 mb-1">Pending</div>
             <div className="text-3xl font-bold text-yellow-600">
-              {bookings.filter((b) => b.status === 'pending').length}
+              {statusCounts.pending ?? 0}
             </div>
           </div>
           <div className="bg-white p-6 rounded-lg shadow-md border-l-4 border-green-500">
             <div className="text-sm text-gray-600 mb-1">Confirmed</div>
             <div className="text-3xl font-bold text-green-600">
-              {bookings.filter((b) => b.status === 'confirmed').length}
+              {statusCounts.confirmed ?? 0}
             </div>
           </div>
           <div className="bg-white p-6 rounded-lg shadow-md border-l-4 border-red-500">
             <div className="text-sm text-gray-600 mb-1">Cancelled</div>
             <div className="text-3xl font-bold text-red-600">
-              {bookings.filter((b) => b.status === 'cancelled').length}
+              {statusCounts.cancelled ?? 0}
             </div>
           </div>
         </div>
@@ -254,6 +342,7 @@ export default function Dashboard() {
                         </td>
                         <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                           {formatDate(booking.event_date)}
+                          {booking.slot && <div className="text-sm text-gray-500">{booking.slot}</div>}
                         </td>
                         <td className="px-6 py-4 whitespace-nowrap">
                           <span
@@ -383,7 +472,10 @@ export default function Dashboard() {
                       <Calendar className="w-4 h-4" />
                       Event Date
                     </div>
-                    <div className="text-gray-900 font-medium">{formatDate(selectedBooking.event_date)}</div>
+                    <div className="text-gray-900 font-medium">
+                      {formatDate(selectedBooking.event_date)}
+                      {selectedBooking.slot && <span className="text-gray-500"> ({selectedBooking.slot})</span>}
+                    </div>
                   </div>
 
                   <div>
@@ -61,16 +61,39 @@ export default function Chatbot() {
         content: msg.content,
       }));
 
-      const response = await fetch(`${BACKEND_URL}/api/chat`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          message: userMessage.content,
-          conversation_history: conversationHistory,
-        }),
-      });
+      // Retries of this message reuse its key, so a request that reached
+      // the server before the connection dropped is answered only once
+      const idempotencyKey = crypto.randomUUID();
+      const send = () =>
+        fetch(`${BACKEND_URL}/api/chat`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey,
+          },
+          body: JSON.stringify({
+            message: userMessage.content,
+            conversation_history: conversationHistory,
+          }),
+        });
+
+      let response: Response;
+      try {
+        response = await send();
+      } catch {
+        response = await send();
+      }
+      if (response.status === 409) {
+        // The first attempt is still being answered; wait for its reply
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        response = await send();
+      }
+      const retryAfter = Number(response.headers.get('Retry-After'));
+      if ((response.status === 429 || response.status === 503) && retryAfter > 0 && retryAfter <= 5) {
+        // Busy or rate limited: try once more when the server suggests
+        await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+        response = await send();
+      }
 
       if (!response.ok) {
         throw new Error('Failed to get response');